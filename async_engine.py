@@ -0,0 +1,185 @@
+# Description: An asyncio engine that checks many tutors at once through the Canvas API. It reads the same to-do items and
+# submissions as APIChecker, but fetches every tutor's dashboard and submissions concurrently, within a concurrency limit and
+# a per-host rate limit. Overdue submissions are returned so they can be screenshotted with the browser afterwards
+
+import asyncio
+import json
+import time
+import urllib.parse
+
+# Optional - only needed for the async engine
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Custom modules
+import canvas_api
+import checker
+import dates
+import timing
+from utils import *
+
+
+RETRY_STATUSES = (429, 502, 503, 504) # Responses worth trying again
+RETRIES = 3
+
+
+# Spaces out requests to one host, so that no more than rate requests are started each second
+class RateLimiter:
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_start = 0
+        self.lock = asyncio.Lock()
+
+
+    # Waits until the next request is allowed to start
+    async def wait(self):
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncEngine:
+
+    def __init__(self, canvas_url, token, timeout, use_hours, overdue_length, concurrency, rate):
+        self.CANVAS_URL = canvas_url
+        self.TOKEN = token
+        self.TIMEOUT = timeout
+        self.USE_HOURS = use_hours
+        self.OVERDUE_LENGTH = overdue_length
+        self.CONCURRENCY = concurrency # Most requests in flight at once
+        self.RATE = rate # Most requests started per second, per host. 0 for no limit
+
+        self.session = None
+        self.semaphore = None
+        self.rate_limiters = {} # By host
+
+
+    # Gets a JSON list from the API, following pagination links. Raises an exception if the request fails.
+    # If started is an empty list, the time the first request is let through the concurrency limit is added to it
+    async def get_json(self, path, params, started=None):
+        url = self.CANVAS_URL + path + "?" + urllib.parse.urlencode(params)
+        items = []
+
+        while url:
+            host = urllib.parse.urlparse(url).netloc
+            if host not in self.rate_limiters:
+                self.rate_limiters[host] = RateLimiter(self.RATE)
+
+            for attempt in range(0, RETRIES + 1):
+                await self.rate_limiters[host].wait()
+                async with self.semaphore:
+                    if started is not None and not started:
+                        started.append(time.perf_counter())
+                    async with self.session.get(url) as response:
+                        status = response.status
+                        if status == 200:
+                            # Canvas prefixes JSON with while(1); when it is requested without a token, so read it as text
+                            items += json.loads((await response.text()).removeprefix("while(1);"))
+                            next_link = response.links.get("next")
+                            next_url = str(next_link["url"]) if next_link else None
+
+                if status == 200:
+                    url = next_url
+                    break
+                if status not in RETRY_STATUSES or attempt == RETRIES:
+                    raise Exception(f"Canvas API returned {status} for {path}")
+                # Back off with the response closed and the concurrency slot given up, so other requests can use it meanwhile
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+        return items
+
+
+    # Gets the unmarked submissions of one assignment
+    async def get_submissions(self, user_id, assignment_url):
+        course_id, assignment_id = canvas_api.parse_assignment_url(assignment_url)
+        submissions = await self.get_json(f"/api/v1/courses/{course_id}/assignments/{assignment_id}/submissions", {"as_user_id": user_id, "per_page": 100})
+        return assignment_url, canvas_api.unmarked_submissions(submissions)
+
+
+    # Checks one tutor. Returns the text to output against the tutor (None if we could not act as them), and a list of
+    # (assignment URL, student ID, screenshot number) for each overdue submission. started is passed on to the first request
+    async def check_tutor(self, tutors, current_tutor, started=None):
+        tutor = tutors[current_tutor]
+        overdue = []
+
+        try:
+            todo = await self.get_json("/api/v1/users/self/todo", {"as_user_id": tutor.id, "per_page": 100}, started)
+        except Exception as e:
+            log("Act as user - Error", f"Could not act as user {tutor.name}: {e}")
+            return None, overdue
+
+        assignment_urls, submission_count = canvas_api.parse_todo(todo)
+        if not assignment_urls:
+            return "No Items on dashboard", overdue
+
+        # Fetch every assignment at once, and add each one to the tutor as it arrives
+        for task in asyncio.as_completed([self.get_submissions(tutor.id, assignment_url) for assignment_url in assignment_urls]):
+            try:
+                assignment_url, submissions = await task
+            except Exception as e:
+                log(tutor.name, f"Error checking assignment: " + str(e))
+                continue
+
+            for student_id, submitted in submissions:
+                hours, days = dates.time_since_submission(submitted)
+                is_overdue = checker.assignment_is_overdue(hours, days, self.USE_HOURS, self.OVERDUE_LENGTH)
+                if is_overdue:
+                    overdue.append((assignment_url, student_id, tutor.get_overdue() + 1))
+                tutor.add_assignment(hours, days, is_overdue, assignment_url, student_id, submitted)
+
+        return f"Assignments overdue: {tutor.get_overdue()}", overdue
+
+
+    # Checks one tutor, timing it and reporting the result through on_result(position, output text). Every tutor is started at once,
+    # so the time is taken from when its first request gets through the concurrency limit, not including the time it was queued for
+    async def run_tutor(self, tutors, current_tutor, on_result):
+        started = []
+        result, overdue = await self.check_tutor(tutors, current_tutor, started)
+        if started:
+            timing.record("tutor total", time.perf_counter() - started[0], tutors[current_tutor].name)
+
+        if on_result:
+            on_result(current_tutor, result)
+        return current_tutor, overdue
+
+
+    # Checks the tutors at the given positions. Returns a list of (position, assignment URL, student ID, screenshot number) for each overdue submission
+    async def run(self, tutors, positions, on_result=None):
+        self.semaphore = asyncio.Semaphore(self.CONCURRENCY)
+        connector = aiohttp.TCPConnector(limit=self.CONCURRENCY)
+        timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
+
+        overdue = []
+        async with aiohttp.ClientSession(headers={"Authorization": f"Bearer {self.TOKEN}"}, connector=connector, timeout=timeout) as self.session:
+            for task in asyncio.as_completed([self.run_tutor(tutors, current_tutor, on_result) for current_tutor in positions]):
+                try:
+                    current_tutor, tutor_overdue = await task
+                except Exception as e:
+                    log("Error", f"Error checking tutor: {e}")
+                    continue
+                overdue += [(current_tutor,) + item for item in tutor_overdue]
+
+        return overdue
+
+
+# Checks the tutors at the given positions with the async engine. Returns the overdue submissions, as AsyncEngine.run does
+def run_sweep(canvas_url, token_file, timeout, use_hours, overdue_length, concurrency, rate, tutors, positions, on_result=None):
+    if aiohttp is None:
+        log("Fatal error", "The async engine needs aiohttp. Install it with: pip install aiohttp")
+        sys.exit()
+
+    engine = AsyncEngine(canvas_url, canvas_api.load_token(token_file), timeout, use_hours, overdue_length, concurrency, rate)
+
+    start = time.perf_counter()
+    overdue = asyncio.run(engine.run(tutors, positions, on_result))
+    elapsed = time.perf_counter() - start
+    log("Status", f"Async engine checked {len(positions)} tutors in {elapsed:.1f}s ({len(positions) / max(elapsed, 0.001):.1f} tutors per second)")
+
+    return overdue
@@ -0,0 +1,165 @@
+# Description: Benchmarks the browser checker end to end against the local fixture server - one tutor, and a sweep of many tutors -
+# along with the date parser. Results are saved per version in benchmarks/results, and compared with an earlier version to show regressions.
+# Usage: python benchmarks/bench_checker.py [--rounds 5] [--sweep-tutors 100] [--baseline 2.A] [--parsers-only]
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Custom modules
+import bench_dates
+import checker
+import dashboardchecker
+import dates
+import fixture_server
+import screenshots
+import stub_canvas
+import utils
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REGRESSION_THRESHOLD = 0.2 # A benchmark this much slower than the baseline (by median) is reported as a regression
+
+
+# Runs function rounds times. Returns the min, max, mean, median and standard deviation of the rounds, in seconds
+def measure(function, rounds):
+    times = []
+    for i in range(0, rounds):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return {
+        "rounds": rounds,
+        "min": min(times),
+        "max": max(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "stddev": statistics.stdev(times) if rounds > 1 else 0,
+    }
+
+
+# Benchmarks the date parser over the corpus of date strings, one round being one pass over the corpus
+def bench_parsers(rounds):
+    with open(bench_dates.CORPUS_FILE) as f:
+        corpus = json.load(f)
+
+    results = {}
+    results["parser: legacy"] = measure(lambda: [bench_dates.legacy_time_since(date_string) for date_string in corpus], rounds)
+
+    results["parser: cold cache"] = measure(lambda: (dates.read_date_string.cache_clear(), [bench_dates.new_time_since(date_string) for date_string in corpus]), rounds)
+
+    dates.read_date_string.cache_clear()
+    results["parser: warm cache"] = measure(lambda: [bench_dates.new_time_since(date_string) for date_string in corpus], rounds)
+    return results
+
+
+# Checks the given tutors one after another with a logged in checker, then clears their results so the next round starts fresh
+def check_tutors(Driver, tutors):
+    for current_tutor in range(0, len(tutors)):
+        dashboardchecker.check_tutor(Driver, tutors, current_tutor)
+    for tutor in tutors:
+        tutor.reset()
+
+
+# Benchmarks Checker against the fixture server: the tutor with the most submissions, then a sweep of every tutor
+def bench_checker(rounds, sweep_tutors, sweep_rounds):
+    tutor_ids = [str(1000 + i) for i in range(0, sweep_tutors)]
+    data = stub_canvas.generate_data(tutor_ids)
+    server = fixture_server.start(data)
+    canvas_url = f"http://127.0.0.1:{server.server_port}"
+
+    account_file = os.path.join(utils.output_dir, "account.txt")
+    with open(account_file, "w") as f:
+        f.write("benchmark\nbenchmark\n")
+
+    # No cache or fast path, so every submission is read from its page each round
+    Driver = checker.Checker(dashboardchecker.options_array, dashboardchecker.TIMEOUT, canvas_url, dashboardchecker.USE_HOURS, dashboardchecker.OVERDUE_LENGTH,
+                             None, dashboardchecker.LEAN_PROFILE, dashboardchecker.BATCH_SUBMISSIONS)
+    results = {}
+    try:
+        Driver.login(account_file)
+
+        busiest = max(tutor_ids, key=lambda tutor_id: sum(item["needs_grading_count"] for item in data["todo"][tutor_id]))
+        results["checker: single tutor"] = measure(lambda: check_tutors(Driver, [dashboardchecker.Tutor("Busiest tutor", busiest)]), rounds)
+
+        sweep = [dashboardchecker.Tutor(f"Tutor {tutor_id}", tutor_id) for tutor_id in tutor_ids]
+        results[f"checker: {sweep_tutors} tutor sweep"] = measure(lambda: check_tutors(Driver, sweep), sweep_rounds)
+    finally:
+        Driver.quit()
+        screenshots.close()
+        server.shutdown()
+
+    return results
+
+
+# Returns the results saved for a version, or None if there are none
+def load_results(version):
+    path = os.path.join(RESULTS_DIR, f"{version}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# Returns the version of the most recently saved results other than the given version, or None if there are none
+def latest_other_version(version):
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+
+    paths = [os.path.join(RESULTS_DIR, name) for name in os.listdir(RESULTS_DIR) if name.endswith(".json") and name != f"{version}.json"]
+    if not paths:
+        return None
+    return os.path.splitext(os.path.basename(max(paths, key=os.path.getmtime)))[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the checker against the local fixture server, and the date parser")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds of the single tutor benchmark (default 5)")
+    parser.add_argument("--parser-rounds", type=int, default=2000, help="Rounds of the parser benchmarks (default 2000)")
+    parser.add_argument("--sweep-tutors", type=int, default=100, help="Tutors in the sweep benchmark (default 100)")
+    parser.add_argument("--sweep-rounds", type=int, default=1, help="Rounds of the sweep benchmark (default 1)")
+    parser.add_argument("--parsers-only", action="store_true", help="Only run the parser benchmarks, eg where chrome is not installed")
+    parser.add_argument("--version", default=dashboardchecker.VERSION, help=f"Version to save the results as (default {dashboardchecker.VERSION})")
+    parser.add_argument("--baseline", help="Version to compare against (default the most recently saved other version)")
+    args = parser.parse_args()
+
+    # Silence the logging of every tutor and submission. Modules keep their own reference to log, so replace each one
+    quiet = lambda type, content: None
+    for module in (utils, checker, dates, screenshots, dashboardchecker):
+        module.log = quiet
+
+    utils.output_dir = tempfile.mkdtemp(prefix="bench_checker_")
+    os.makedirs(os.path.join(utils.output_dir, "overdue"))
+
+    results = bench_parsers(args.parser_rounds)
+    if not args.parsers_only:
+        results.update(bench_checker(args.rounds, args.sweep_tutors, args.sweep_rounds))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"{args.version}.json"), "w") as f:
+        json.dump({
+            "version": args.version,
+            "date": time.strftime("%Y-%m-%d %H:%M"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "benchmarks": results,
+        }, f, indent=4)
+
+    baseline_version = args.baseline or latest_other_version(args.version)
+    baseline = load_results(baseline_version)["benchmarks"] if baseline_version and load_results(baseline_version) else {}
+
+    print(f"{'Benchmark':<32}{'Median':>12}{'Min':>12}{'Stddev':>12}{'Rounds':>8}" + (f"{'vs ' + baseline_version:>14}" if baseline else ""))
+    for name, result in results.items():
+        line = f"{name:<32}{result['median'] * 1000:>10.3f}ms{result['min'] * 1000:>10.3f}ms{result['stddev'] * 1000:>10.3f}ms{result['rounds']:>8}"
+        if name in baseline:
+            change = result["median"] / baseline[name]["median"] - 1
+            line += f"{change:>+13.1%}" + (" REGRESSION" if change > REGRESSION_THRESHOLD else "")
+        print(line)
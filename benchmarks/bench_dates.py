@@ -0,0 +1,80 @@
+# Description: Microbenchmark of the submission date parser, over sample date strings in each format SpeedGrader shows.
+# Usage: python benchmarks/bench_dates.py [--number 2000]
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Custom modules
+import dates
+import utils
+
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "date_strings.json")
+
+
+# The parser used before dates.py, kept as a baseline. Strips the string down and tries strptime, once each for hours and days
+def legacy_parse(date_string):
+    if "missing" in date_string or "no submission time" in date_string:
+        return None
+
+    date_string = date_string.replace("Submitted:\n", "").replace("at ", "").rstrip().replace("\n", "")
+    contains_year = 0
+    for i in range(0, 5):
+        last_year = str(dates.datetime.datetime.now().year - i)
+        if last_year in date_string:
+            date_string = date_string.replace(last_year, "")
+            contains_year = i
+            break
+
+    try:
+        return dates.datetime.datetime.strptime(str(dates.datetime.datetime.now().year - contains_year) + " " + date_string, "%Y %d %b %H:%M")
+    except ValueError:
+        return None
+
+
+def legacy_time_since(date_string):
+    for i in range(0, 2):
+        submitted = legacy_parse(date_string)
+    if submitted:
+        return dates.time_since_submission(submitted)
+
+
+def new_time_since(date_string):
+    submitted = dates.parse_submission_date(date_string)
+    if submitted:
+        return dates.time_since_submission(submitted)
+
+
+# Returns the time per date string, in microseconds
+def bench(function, corpus, number):
+    total = timeit.timeit(lambda: [function(date_string) for date_string in corpus], number=number)
+    return total / (number * len(corpus)) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the submission date parser")
+    parser.add_argument("--number", type=int, default=2000, help="How many times to parse the corpus")
+    args = parser.parse_args()
+
+    with open(CORPUS_FILE) as f:
+        corpus = json.load(f)
+
+    # Silence the warnings logged for the missing and no submission time strings
+    utils.log = lambda type, content: None
+    dates.log = utils.log
+
+    legacy = bench(legacy_time_since, corpus, args.number)
+
+    dates.read_date_string.cache_clear()
+    cold = bench(lambda date_string: (dates.read_date_string.cache_clear(), new_time_since(date_string)), corpus, args.number)
+    warm = bench(new_time_since, corpus, args.number)
+
+    print(f"{len(corpus)} date strings, parsed {args.number} times")
+    print(f"Legacy strip_date_string + strptime: {legacy:.2f} us per string")
+    print(f"Compiled regex, cold cache:          {cold:.2f} us per string")
+    print(f"Compiled regex, warm cache:          {warm:.2f} us per string ({legacy / warm:.1f}x faster)")
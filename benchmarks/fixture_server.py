@@ -0,0 +1,249 @@
+# Description: A local Canvas serving the pages the browser checker reads - login, act as user, the dashboard and SpeedGrader - from the
+# HTML fixtures in benchmarks/fixtures, filled in with the same generated data as stub_canvas.py. Includes assignments with several
+# students (the dropdown), several attempts, and the "missing" and "no submission time" cases, so Checker can be run end to end offline.
+# Usage: python benchmarks/fixture_server.py [--port 8001] [--tutors 100], then run the checker with --canvas-url http://localhost:8001
+
+import argparse
+import datetime
+import html
+import http.server
+import json
+import os
+import re
+import string
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Custom modules
+import stub_canvas
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ADMIN_ID = 1
+VISIBLE_TODO_ITEMS = 3 # The dashboard hides the rest of the to-do list behind a "more..." link, as canvas does
+
+# Students are given the unusual cases by their ID, so the same students have them on every run
+NO_SUBMISSION_TIME_EVERY = 13
+MISSING_EVERY = 17
+MULTIPLE_ATTEMPTS_EVERY = 5
+
+
+# Loads an HTML fixture as a template
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name)) as f:
+        return string.Template(f.read())
+
+
+# Formats a time as SpeedGrader shows it, eg "5 Mar at 14:32". The year is only shown if it is not this year
+def speedgrader_date(submitted):
+    year = f" {submitted.year}" if submitted.year != datetime.datetime.now().year else ""
+    return f"{submitted.day} {submitted:%b}{year} at {submitted.hour}:{submitted:%M}"
+
+
+# Returns the submission details SpeedGrader shows for a student's submission
+def submission_details(student_id, submitted_at):
+    submitted = datetime.datetime.fromisoformat(submitted_at.replace("Z", "+00:00")).astimezone().replace(tzinfo=None)
+
+    if student_id % NO_SUBMISSION_TIME_EVERY == 0:
+        return '<div id="multiple_submissions">Submitted:<br>no submission time</div>'
+    if student_id % MISSING_EVERY == 0:
+        return f'<div id="multiple_submissions">Submitted:<br>{speedgrader_date(submitted)} missing</div>'
+    if student_id % MULTIPLE_ATTEMPTS_EVERY == 0:
+        earlier = submitted - datetime.timedelta(days=2)
+        return ('<select id="submission_to_view">'
+                f'<option selected>{speedgrader_date(submitted)}</option>'
+                f'<option>{speedgrader_date(earlier)}</option>'
+                '</select>')
+    return f'<div id="multiple_submissions">Submitted:<br>{speedgrader_date(submitted)}</div>'
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    data = None
+    latency = 0
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.latency)
+
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        cookies = self.cookies()
+
+        if url.path == "/login/canvas":
+            return self.send_html(200, load_fixture("login.html").substitute())
+
+        if "fixture_session" not in cookies:
+            if url.path.startswith("/api/"):
+                return self.send_json(401, {"status": "unauthenticated"})
+            return self.redirect("/login/canvas")
+
+        if url.path == "/api/v1/users/self":
+            return self.send_json(200, {"id": int(cookies.get("as_user", ADMIN_ID))})
+
+        if url.path in ("/", "/dashboard"):
+            return self.send_html(200, self.dashboard(cookies.get("as_user")))
+
+        match = re.fullmatch(r"/users/(\d+)/masquerade", url.path)
+        if match:
+            if match.group(1) not in self.data["todo"]:
+                return self.send_html(401, load_fixture("masquerade_denied.html").substitute())
+            return self.send_html(200, load_fixture("masquerade.html").substitute(user_id=match.group(1), user_name=f"User {match.group(1)}"))
+
+        match = re.fullmatch(r"/users/(\d+)/masquerade/start", url.path)
+        if match:
+            return self.redirect("/", f"as_user={match.group(1)}; Path=/")
+
+        if url.path == "/masquerade/stop":
+            return self.redirect("/", "as_user=; Path=/; Max-Age=0")
+
+        match = re.fullmatch(r"/courses/(\d+)/gradebook/speed_grader", url.path)
+        if match:
+            assignment_id = params.get("assignment_id", [""])[0]
+            submissions = self.data["submissions"].get(f"{match.group(1)}/{assignment_id}")
+            if submissions is None:
+                return self.send_html(404, "<html><head><title>Page Not Found</title></head><body></body></html>")
+            return self.send_html(200, self.speedgrader(assignment_id, submissions, params.get("student_id", [None])[0]))
+
+        self.send_html(404, "<html><head><title>Page Not Found</title></head><body></body></html>")
+
+
+    # Logs in as the admin user, whatever the username and password
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urllib.parse.urlparse(self.path).path == "/login/canvas":
+            return self.redirect("/", "fixture_session=admin; Path=/; HttpOnly")
+        self.send_html(404, "")
+
+
+    # Returns the dashboard of the user being acted as, or an empty one for the admin user
+    def dashboard(self, user_id):
+        banner = ""
+        items = []
+        if user_id:
+            banner = '<div id="masquerade_bar"><a href="/masquerade/stop">Stop acting as user</a></div>'
+            items = self.data["todo"].get(user_id, [])
+
+        if not items:
+            return load_fixture("dashboard.html").substitute(masquerade_banner=banner, todo_list="")
+
+        todo_list = '<h2 class="todo-list-header">To Do</h2>\n<ul class="right-side-list to-do-list">\n'
+        for i, item in enumerate(items):
+            count = item["needs_grading_count"]
+            hidden = " hidden" if i >= VISIBLE_TODO_ITEMS else ""
+            todo_list += (f'<li class="todo{hidden}"><a class="item" href="{html.escape(item["html_url"])}">'
+                          f'<div class="todo-badge"><span>{count}</span><span class="screenreader-only">{count} needs grading</span></div>'
+                          f'<span class="todo-title">Grade Assignment {i + 1}</span></a></li>\n')
+        if len(items) > VISIBLE_TODO_ITEMS:
+            todo_list += (f'<li><a class="more_link" href="#" onclick="document.querySelectorAll(\'.todo.hidden\').forEach(function(e) {{ e.classList.remove(\'hidden\'); }}); '
+                          f'this.parentNode.remove(); return false;">{len(items) - VISIBLE_TODO_ITEMS} more...</a></li>\n')
+        todo_list += "</ul>"
+
+        return load_fixture("dashboard.html").substitute(masquerade_banner=banner, todo_list=todo_list)
+
+
+    # Returns the SpeedGrader page of an assignment, showing the given student's submission, or the first student's
+    def speedgrader(self, assignment_id, submissions, student_id):
+        students = []
+        json_submissions = []
+        for submission in submissions:
+            student = {"id": str(submission["user_id"]), "name": f"Student {submission['user_id']}", "details": submission_details(submission["user_id"], submission["submitted_at"])}
+            students.append(student)
+
+            # The SpeedGrader data has no submission time for the same students the page shows none for
+            unusual = submission["user_id"] % NO_SUBMISSION_TIME_EVERY == 0 or submission["user_id"] % MISSING_EVERY == 0
+            json_submissions.append(dict(submission, submitted_at=None if unusual else submission["submitted_at"]))
+
+        current = next((student for student in students if student["id"] == student_id), students[0])
+        student_items = "\n".join(f'<li class="not_graded" onclick="showStudent({i})"><span class="ui-selectmenu-item-header">{html.escape(student["name"])}</span></li>'
+                                  for i, student in enumerate(students))
+        json_data = {
+            "context": {"students": [{"id": student["id"], "name": student["name"]} for student in students]},
+            "submissions": json_submissions,
+        }
+
+        # Stop </script> in the data from ending the script early
+        def script_json(value):
+            return json.dumps(value).replace("</", "<\\/")
+
+        return load_fixture("speedgrader.html").substitute(
+            assignment_name=f"Assignment {assignment_id}",
+            json_data=script_json(json_data),
+            students=script_json(students),
+            student_name=html.escape(current["name"]),
+            student_items=student_items,
+            submission_details=current["details"],
+        )
+
+
+    def cookies(self):
+        cookies = {}
+        for part in self.headers.get("Cookie", "").split(";"):
+            if "=" in part:
+                name, value = part.strip().split("=", 1)
+                if value:
+                    cookies[name] = value
+        return cookies
+
+
+    def redirect(self, location, cookie=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+    def send_html(self, status, body):
+        self.send_content(status, "text/html; charset=utf-8", body.encode())
+
+
+    def send_json(self, status, body):
+        self.send_content(status, "application/json", json.dumps(body).encode())
+
+
+    def send_content(self, status, content_type, content):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+    # Only log errors, the checker makes a lot of requests
+    def log_message(self, format, *args):
+        pass
+
+
+# Creates a fixture server for the given data (from stub_canvas.generate_data). Port 0 picks a free port, which can be read from server.server_port
+def make_server(data, port=0, latency=0):
+    handler = type("Handler", (FixtureHandler,), {"data": data, "latency": latency})
+    return http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+# Starts the fixture server in a background thread. Returns the server, call shutdown() on it to stop
+def start(data, port=0, latency=0):
+    server = make_server(data, port, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the Canvas pages the checker reads, for offline runs and benchmarks")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--tutors", type=int, help="Generate this many tutors, instead of using the tutors in tutors.json")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds to wait before answering each request")
+    args = parser.parse_args()
+
+    if args.tutors:
+        tutor_ids = [str(1000 + i) for i in range(0, args.tutors)]
+    else:
+        with open("tutors.json") as f:
+            tutor_ids = list(json.load(f).keys())
+
+    print(f"Serving Canvas fixtures on http://localhost:{args.port}")
+    make_server(stub_canvas.generate_data(tutor_ids), args.port, args.latency).serve_forever()
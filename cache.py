@@ -0,0 +1,133 @@
+# Description: On-disk cache of submission times, so submissions timed on a previous run do not need their page loaded again.
+# Also keeps a fingerprint of each tutor's dashboard, so an unchanged dashboard can be checked from the cache alone
+
+import json
+import sqlite3
+import threading
+
+# Custom modules
+from utils import *
+
+
+class SubmissionCache:
+
+    # Opens (or creates) the cache database, and evicts entries older than ttl_hours
+    def __init__(self, filename, ttl_hours):
+        self.TTL_HOURS = ttl_hours
+
+        # Workers share one connection, so access is serialised with a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                tutor_id TEXT NOT NULL,
+                assignment_url TEXT NOT NULL,
+                student TEXT NOT NULL,
+                submitted_at TEXT NOT NULL,
+                checked_at TEXT NOT NULL,
+                PRIMARY KEY (tutor_id, assignment_url, student)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS submissions_checked_at ON submissions (checked_at)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS dashboards (
+                tutor_id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                submissions TEXT NOT NULL,
+                checked_at TEXT NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+        self.evict()
+
+
+    # Returns the oldest checked_at that is still fresh. Reads only use entries checked since, so a long running process (eg the daemon)
+    # stops using an entry once it expires, without waiting for it to be evicted
+    def fresh_since(self):
+        return (datetime.datetime.now() - datetime.timedelta(hours=self.TTL_HOURS)).isoformat()
+
+
+    # Removes entries that were timed more than TTL_HOURS ago, so they are checked again. This also catches resubmissions
+    def evict(self):
+        oldest = self.fresh_since()
+        with self.lock:
+            evicted = self.connection.execute("DELETE FROM submissions WHERE checked_at < ?", (oldest,)).rowcount
+            self.connection.execute("DELETE FROM dashboards WHERE checked_at < ?", (oldest,))
+            self.connection.commit()
+
+        if evicted:
+            log("Cache", f"Evicted {evicted} submissions older than {self.TTL_HOURS} hours")
+
+
+    # Removes every entry, forcing a full refresh
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM submissions")
+            self.connection.execute("DELETE FROM dashboards")
+            self.connection.commit()
+        log("Cache", "Cleared submission cache")
+
+
+    # Returns the cached submission time as a datetime, or None if the submission has not been seen before
+    def get(self, tutor_id, assignment_url, student):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT submitted_at FROM submissions WHERE tutor_id = ? AND assignment_url = ? AND student = ? AND checked_at >= ?",
+                (str(tutor_id), assignment_url, student, self.fresh_since())
+            ).fetchone()
+
+        if row:
+            return datetime.datetime.fromisoformat(row[0])
+        return None
+
+
+    # Stores the submission time of a submission
+    def put(self, tutor_id, assignment_url, student, submitted):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO submissions (tutor_id, assignment_url, student, submitted_at, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (str(tutor_id), assignment_url, student, submitted.isoformat(), datetime.datetime.now().isoformat())
+            )
+            self.connection.commit()
+
+
+    # Returns the oldest cached submission time of each tutor, by tutor ID
+    def oldest_by_tutor(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT tutor_id, MIN(submitted_at) FROM submissions WHERE checked_at >= ? GROUP BY tutor_id", (self.fresh_since(),)).fetchall()
+        return {tutor_id: datetime.datetime.fromisoformat(submitted_at) for tutor_id, submitted_at in rows}
+
+
+    # Returns the oldest cached submission time of each of a tutor's assignments, by assignment URL
+    def oldest_by_assignment(self, tutor_id):
+        with self.lock:
+            rows = self.connection.execute("SELECT assignment_url, MIN(submitted_at) FROM submissions WHERE tutor_id = ? AND checked_at >= ? GROUP BY assignment_url",
+                                       (str(tutor_id), self.fresh_since())).fetchall()
+        return {assignment_url: datetime.datetime.fromisoformat(submitted_at) for assignment_url, submitted_at in rows}
+
+
+    # Returns the fingerprint of a tutor's dashboard when it was last walked, and the (assignment URL, student, screenshot URL) of each
+    # submission on it. Returns (None, None) if the dashboard has not been walked before
+    def get_dashboard(self, tutor_id):
+        with self.lock:
+            row = self.connection.execute("SELECT fingerprint, submissions FROM dashboards WHERE tutor_id = ? AND checked_at >= ?", (str(tutor_id), self.fresh_since())).fetchone()
+
+        if row:
+            return row[0], [tuple(submission) for submission in json.loads(row[1])]
+        return None, None
+
+
+    # Stores the fingerprint of a tutor's dashboard, and the submissions that were on it
+    def put_dashboard(self, tutor_id, fingerprint, submissions):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO dashboards (tutor_id, fingerprint, submissions, checked_at) VALUES (?, ?, ?, ?)",
+                (str(tutor_id), fingerprint, json.dumps(submissions), datetime.datetime.now().isoformat())
+            )
+            self.connection.commit()
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
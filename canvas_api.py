@@ -0,0 +1,211 @@
+# Description: Data source that reads to-do items and submission times from the Canvas REST API instead of scraping the page.
+# APIChecker has the same methods as Checker, so either can be used to check a tutor. Selenium is only started to screenshot overdue items
+
+import json
+import re
+import urllib.parse
+
+import urllib3
+
+# Custom modules
+import checker
+import dates
+import timing
+from utils import *
+
+
+# Returns the to-do items which need grading, as lists of assignment URLs and how many submissions are behind each URL
+def parse_todo(todo_items):
+    assignment_urls = []
+    assm_num = []
+    for item in todo_items:
+        if item.get("type") == "grading":
+            assignment_urls.append(item["html_url"])
+            assm_num.append(item.get("needs_grading_count", 1))
+
+    return assignment_urls, assm_num
+
+
+# Gets the course and assignment ID from a SpeedGrader URL eg /courses/1/gradebook/speed_grader?assignment_id=2
+def parse_assignment_url(assignment_url):
+    url = urllib.parse.urlparse(assignment_url)
+    course_id = re.search(r"/courses/(\d+)", url.path).group(1)
+    assignment_id = urllib.parse.parse_qs(url.query)["assignment_id"][0]
+    return course_id, assignment_id
+
+
+# Returns (student ID, submission time) for each submission that is waiting to be marked
+def unmarked_submissions(submissions):
+    unmarked = []
+    for submission in submissions:
+        if submission.get("workflow_state") in checker.UNMARKED_STATES and submission.get("submitted_at"):
+            unmarked.append((str(submission["user_id"]), dates.parse_canvas_timestamp(submission["submitted_at"])))
+
+    return unmarked
+
+
+# Loads the Canvas API token from the first line of a file
+def load_token(token_file):
+    try:
+        with open(token_file, "r") as f:
+            token = f.readline().strip()
+    except FileNotFoundError:
+        log("Fatal error", f"Could not log in - The {token_file} file could not be loaded")
+        sys.exit()
+
+    if not token:
+        log("Fatal error", f"Could not log in - No API token found in {token_file}")
+        sys.exit()
+
+    return token
+
+
+class APIChecker:
+
+    # Constructor. Sets up the HTTP connection pool. The chrome driver is only started if a screenshot is needed
+    def __init__(self, options_array, timeout, canvas_url, use_hours, overdue_length, token_file="token.txt"):
+        self.OPTIONS_ARRAY = options_array
+        self.TIMEOUT = timeout
+        self.CANVAS_URL = canvas_url
+        self.USE_HOURS = use_hours
+        self.OVERDUE_LENGTH = overdue_length
+        self.TOKEN_FILE = token_file
+
+        self.http = None
+        self.browser = None # Checker used for screenshots
+        self.account_file_name = None
+        self.session_store = None
+        self.screenshots_enabled = True
+        self.user_id = None
+        self.todo = []
+
+
+    # Loads the API token, and remembers the account file (and session store) in case the browser needs to log in for a screenshot
+    def login(self, account_file_name, session_store=None):
+        token = load_token(self.TOKEN_FILE)
+
+        # A single pooled session is used for every request, so connections to canvas are kept alive between requests
+        self.http = urllib3.PoolManager(
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=urllib3.Timeout(total=self.TIMEOUT),
+            retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504)),
+        )
+        self.account_file_name = account_file_name
+        self.session_store = session_store
+        log("Authentication Complete", "Using the Canvas API")
+
+
+    # Gets a JSON list from the API, following pagination links. Raises an exception if the request fails
+    def get_json(self, path, params):
+        url = self.CANVAS_URL + path + "?" + urllib.parse.urlencode(params)
+        items = []
+
+        while url:
+            response = self.http.request("GET", url)
+            if response.status != 200:
+                raise Exception(f"Canvas API returned {response.status} for {path}")
+            items += json.loads(response.data)
+
+            # Canvas paginates lists, and gives the next page in the Link header
+            url = None
+            for link in response.headers.get("Link", "").split(","):
+                if 'rel="next"' in link:
+                    url = link[link.index("<") + 1:link.index(">")]
+
+        return items
+
+
+    # Act as a user given their ID, by loading their to-do list as them. Return True if successful, False otherwise
+    def act_as_user(self, user_id, user_name):
+        try:
+            self.todo = self.get_json("/api/v1/users/self/todo", {"as_user_id": user_id, "per_page": 100})
+        except Exception as e:
+            log("Act as user - Error", f"Could not act as user {user_name}: {e}")
+            return False
+
+        self.user_id = user_id
+        log("Act as user - Success", f"Acting as user {user_name}")
+        return True
+
+
+    # Returns true if the user has unmarked assignments on their to-do list
+    def dashboard_has_assignments(self):
+        assignment_urls, assm_num = parse_todo(self.todo)
+        return len(assignment_urls) > 0
+
+
+    # Returns URLs of all assignments, and a list of how many of each assignment are behind each URL
+    def get_dashboard_assignments(self):
+        return parse_todo(self.todo)
+
+
+    # Stops acting as a user
+    def stop_acting_as_user(self):
+        self.user_id = None
+        self.todo = []
+
+
+    # Takes a screenshot of a submission in SpeedGrader, starting the browser the first time it is needed
+    def screenshot_submission(self, assignment_url, student_id, tutor_name, number):
+        if not self.screenshots_enabled:
+            return
+
+        if not self.browser:
+            try:
+                self.browser = checker.Checker(self.OPTIONS_ARRAY, self.TIMEOUT, self.CANVAS_URL, self.USE_HOURS, self.OVERDUE_LENGTH)
+                self.browser.login(self.account_file_name, self.session_store)
+            except BaseException as e:
+                # The checker exits on fatal errors. Keep checking without screenshots rather than stopping the sweep
+                log("Error", f"Could not start chrome for screenshots, continuing without them: {e}")
+                self.screenshots_enabled = False
+                return
+
+        with timing.timed("screenshot"):
+            self.browser.driver.get(assignment_url + "&student_id=" + student_id)
+            self.browser.wait_for_submission()
+            self.browser.take_screenshot(tutor_name, number)
+
+
+    # Checks through a list of assignments
+    def check_assignments(self, assignment_urls, submission_count, tutor_name, tutors_list, current_tutor):
+        for assignment_url in assignment_urls:
+            try:
+                course_id, assignment_id = parse_assignment_url(assignment_url)
+
+                # Only the submissions the tutor can see are counted on their to-do list, so get them as the tutor
+                submissions = self.get_json(f"/api/v1/courses/{course_id}/assignments/{assignment_id}/submissions", {"as_user_id": self.user_id, "per_page": 100})
+
+                for student_id, submitted in unmarked_submissions(submissions):
+                    hours, days = dates.time_since_submission(submitted)
+                    is_overdue = checker.assignment_is_overdue(hours, days, self.USE_HOURS, self.OVERDUE_LENGTH)
+
+                    if is_overdue:
+                        self.screenshot_submission(assignment_url, student_id, tutor_name, tutors_list[current_tutor].get_overdue() + 1)
+
+                    tutors_list[current_tutor].add_assignment(hours, days, is_overdue, assignment_url, student_id, submitted)
+
+            except Exception as e:
+                log(tutor_name, f"Error checking assignment: " + str(e))
+
+
+    # Always True, as requests are independent. The screenshot browser is started again by screenshot_submission if needed
+    def is_alive(self):
+        if self.browser and not self.browser.is_alive():
+            self.browser.quit()
+            self.browser = None
+        return True
+
+
+    # Returns the process ID of the screenshot browser, or None if it has not been started
+    def browser_pid(self):
+        if self.browser:
+            return self.browser.browser_pid()
+        return None
+
+
+    # Closes the connection pool and the screenshot browser
+    def quit(self):
+        if self.http:
+            self.http.clear()
+        if self.browser:
+            self.browser.quit()
@@ -1,9 +1,14 @@
 # Description: This file contains the Checker class, which is responsible for all browser interactions
 
+import hashlib
+import json
+import re
 import sys
 import time
+import urllib.parse
 
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -11,92 +16,196 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.select import Select
 
 # Custom modules
+import dashboard
+import dates
+import screenshots
+import timing
+import waits
 from utils import *
 
 
+# -- LEAN PROFILE --
+# Extra chrome options used by the lean profile
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--mute-audio",
+]
+
+# Requests blocked by the lean profile. None of these are needed to read a submission date
+LEAN_BLOCKED_URLS = [
+    # Images, which are only needed for screenshots
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico",
+    # Fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    # Document previews in SpeedGrader
+    "*canvadocs*", "*preview=1*", "*/file_preview*",
+    # Analytics and monitoring scripts
+    "*google-analytics.com*", "*googletagmanager.com*", "*pendo.io*", "*nr-data.net*", "*newrelic.com*", "*fullstory.com*", "*sentry.io*",
+]
+
+
+# Submission states which are waiting to be marked
+UNMARKED_STATES = ("submitted", "pending_review")
+
+# Gets the data SpeedGrader loads for every student. Uses the copy on the page if SpeedGrader has kept one, otherwise requests it again
+SPEEDGRADER_DATA_SCRIPT = """
+    var done = arguments[arguments.length - 1];
+    if (window.jsonData && window.jsonData.submissions) {
+        done(JSON.stringify(window.jsonData));
+        return;
+    }
+
+    var url = new URL(window.location.href);
+    var dataUrl = url.pathname.replace(/speed_grader$/, "speed_grader.json") + "?assignment_id=" + url.searchParams.get("assignment_id");
+    fetch(dataUrl, {credentials: "same-origin", headers: {"Accept": "application/json"}})
+        .then(function(response) { return response.ok ? response.text() : null; })
+        .then(done, function() { done(null); });
+"""
+
+
+# Returns True if an assignment with the given time since submission is overdue
+def assignment_is_overdue(hours, days, use_hours, overdue_length):
+    if use_hours:
+        return hours > overdue_length
+    else:
+        return days > overdue_length
+
+
+# Wait condition: returns the submission date shown on a SpeedGrader page, or False if it has not loaded yet
+def submission_date(driver):
+    # Select the most recent assignment if there is a dropdown of submissions
+    for element in driver.find_elements(By.ID, "submission_to_view"):
+        date_string = Select(element).first_selected_option.text
+        if date_string:
+            return date_string
 
-# Removes trailing words and characters from canvas date string
-def strip_date_string(date_string):
-    # Check first for any anomalies in the date string
-    if "missing" in date_string:
-        log("Warning", f"Could not calculate time since submission: Assignment is marked MISSING")
-        return ""
-    elif "no submission time" in date_string:
-        log("Warning", f"Could not calculate time since submission: No submission time")
-        return ""
-
-    # Process the date string to remove unnecessary text
-    date_string = date_string.replace("Submitted:\n", "").replace("at ", "").rstrip().replace("\n", "")
-
-    # Remove the year from the date string (if it exists), as we want to format it ourselves
-    contains_year = 0
-    for i in range (0, 5):
-        last_year = str(datetime.datetime.now().year - i)
-        if last_year in date_string:
-            date_string = date_string.replace(last_year, "")
-            contains_year = i
-            break
-
-    # Format by adding the year at the start for easier comparison between formats
-    formatted_timestamp = str(datetime.datetime.now().year - contains_year) + " " + date_string
-    return formatted_timestamp
-
-
-# Calculates calendar days since submission. Returns -1 if the date string is invalid
-def calendar_days_since_submission(date_string):
-    formatted_timestamp = strip_date_string(date_string)
-    if formatted_timestamp == "":
-        return -1
-
-    try:
-        diff = (datetime.datetime.now().date() - datetime.datetime.strptime(formatted_timestamp, '%Y %d %b %H:%M').date()).days
-    except Exception as e:
-        log("Error", f"Could not calculate days since submission. Date string: {date_string}")
-        diff = -1
-
-    return diff
-
+    # Otherwise, check for multiple submissions
+    for element in driver.find_elements(By.ID, "multiple_submissions"):
+        date_string = element.get_attribute("innerText") # Gets assignment date
+        if date_string:
+            return date_string
 
-# Calculates hours since submission. Returns -1 if the date string is invalid
-def hours_since_submission(date_string):
-    formatted_timestamp = strip_date_string(date_string)
-    if formatted_timestamp == "":
-        return -1
+    return False
 
-    # Calculate the time difference between now and the submitted timestamp
-    try:
-        time_difference = datetime.datetime.now() - datetime.datetime.strptime(formatted_timestamp, "%Y %d %b %H:%M")
-    except Exception as e:
-        log("Error", f"Could not calculate hours since submission. Date string: {date_string}")
-        return -1
 
-    # Calculate the total hours difference
-    return (time_difference.total_seconds() / 3600)
+# Returns a fingerprint of a dashboard, from its to-do URLs and how many submissions are behind each
+def dashboard_fingerprint(assignment_urls, submission_count):
+    return hashlib.sha1(json.dumps(sorted(zip(assignment_urls, submission_count))).encode()).hexdigest()
 
 
 class Checker:
 
     # Constructor. Initialises chrome driver
-    def __init__(self, options_array, timeout, canvas_url, use_hours, overdue_length):
+    def __init__(self, options_array, timeout, canvas_url, use_hours, overdue_length, cache=None, lean=False, batch=False, fast_path=False, triage=False, tabs=1):
         self.TIMEOUT = timeout
         self.CANVAS_URL = canvas_url
         self.USE_HOURS = use_hours
         self.OVERDUE_LENGTH = overdue_length
+        self.LEAN = lean # If True, pages are loaded without images, fonts, previews or analytics
+        self.BATCH = batch # If True, assignments with multiple submissions are read from the SpeedGrader data instead of opening each student
+        self.cache = cache # Optional SubmissionCache of submission times from previous runs
+        self.FAST_PATH = fast_path and cache is not None # If True, tutors whose dashboard has not changed are checked from the cache alone
+        self.TABS = max(1, tabs) # How many assignments to load at once, each in its own tab. 1 loads them one at a time
+        self.TRIAGE = triage # If True, the dashboard is read from one snapshot, and assignments are read from the API, only walked in SpeedGrader if that fails
+
+        self.dashboard_snapshot = None # The to-do list read by dashboard_has_assignments in triage mode, for get_dashboard_assignments
+
+        self.walked_submissions = [] # (assignment URL, student, screenshot URL) of each submission found on the current tutor's walk
+        self.walk_complete = True # False if any assignment on the current tutor's walk could not be checked
 
         # Convert options array to chrome options, and initialise driver
         options = webdriver.ChromeOptions()
         for i in options_array:
             options.add_argument(i)
 
+        if self.LEAN:
+            for i in LEAN_ARGUMENTS:
+                options.add_argument(i)
+            # Return from get() once the document is parsed. Everything after that is waited for explicitly
+            options.page_load_strategy = "eager"
+
         try:
             self.driver = webdriver.Chrome(service = Service(), options=options)
         except Exception as e:
             log("Fatal Error", "Could not initialise chrome driver. Message: " + str(e))
             sys.exit()
 
+        # Allow as long to read the SpeedGrader data as to load a page
+        self.driver.set_script_timeout(self.TIMEOUT)
+
+        if self.LEAN:
+            # Blocked URLs only apply to this tab, so screenshots can be taken with images in a new tab
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+
+
+    # Closes the browser and ends the driver session
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            log("Error", "Could not close chrome driver. Message: " + str(e))
+
+
+    # Returns True if the browser is still responding
+    def is_alive(self):
+        try:
+            self.driver.execute_script("return 1;")
+            return True
+        except WebDriverException:
+            return False
+
+
+    # Returns the process ID of chromedriver, which chrome runs under
+    def browser_pid(self):
+        return self.driver.service.process.pid
+
+
+    # Returns the ID of the user the browser is logged in as, or None if it is not logged in. Makes one small API request
+    def logged_in_user_id(self):
+        self.driver.get(self.CANVAS_URL + "/api/v1/users/self")
+        try:
+            body = self.driver.find_element(By.TAG_NAME, "body").text
+            return json.loads(body.removeprefix("while(1);"))["id"]
+        except Exception:
+            return None
+
+
+    # Logs in using a saved session, if it is still valid. Returns True if successful
+    def restore_session(self, session_store):
+        user_id, cookies = session_store.load()
+        if not cookies:
+            return False
+        if user_id is None:
+            # Saved without knowing who it was logged in as, so it cannot be checked. A logged out session would also return None
+            session_store.clear()
+            return False
+
+        # Set the cookies through CDP, as selenium can only add cookies for the page the browser is on
+        for cookie in cookies:
+            if "expiry" in cookie:
+                cookie["expires"] = cookie.pop("expiry")
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+
+        # The session must be logged in as the same user as when it was saved. If not, it has expired or was left acting as a tutor
+        if self.logged_in_user_id() == user_id:
+            log("Authentication Complete", "Restored saved session")
+            return True
+
+        log("Authentication", "Saved session is no longer valid, logging in again")
+        session_store.clear()
+        self.driver.delete_all_cookies()
+        return False
+
+
+    # Function to log in to canvas using credential file. If a session store is given, a saved session is used instead of the login form when possible
+    def login(self, account_file_name, session_store=None):
+        if session_store and self.restore_session(session_store):
+            return
 
-    # Function to log in to canvas using credential file
-    def login(self, account_file_name):
         try:
             with open(account_file_name, "r") as f:
                 lines = f.readlines()
@@ -125,6 +234,14 @@ class Checker:
         # Check that login was successful
         if self.driver.title == "Dashboard":
             log("Authentication Complete", "Logged in as %s" % (username))
+
+            # Save the session, so the login form can be skipped next time. Only if we know who it is logged in as, so it can be checked when restored
+            if session_store:
+                user_id = self.logged_in_user_id()
+                if user_id is not None:
+                    session_store.save(user_id, self.driver.get_cookies())
+                else:
+                    log("Authentication", "Could not read the logged in user, so the session was not saved")
         else:
             log("Fatal Error", "Could not log in - Username or password incorrect, or browser timed out.")
             sys.exit()
@@ -137,7 +254,10 @@ class Checker:
             WebDriverWait(self.driver, self.TIMEOUT).until(EC.presence_of_element_located((By.LINK_TEXT, "Proceed")))
             proceed_button = self.driver.find_element(By.LINK_TEXT, "Proceed")
             proceed_button.click()
-        except:
+        except Exception:
+            # If the browser has died, leave it to the caller to restart it and try the tutor again
+            if not self.is_alive():
+                raise
             log("Act as user - Error", f"You do not have permission to act as {user_name}")
             return False
         
@@ -151,6 +271,12 @@ class Checker:
 
     # Get the dashboard assignments. Returns URLs of all assignments, and an list of how many of each assignment are behind each URL.
     def get_dashboard_assignments(self):
+        # In triage mode, the dashboard has already been read
+        if self.dashboard_snapshot is not None:
+            assignment_urls, submission_count = self.dashboard_snapshot
+            self.dashboard_snapshot = None
+            return assignment_urls, submission_count
+
         # Check if there are more assignments to load
         for more_link in self.driver.find_elements(By.XPATH, "//ul//li//a[contains(concat(' ', @class, ' '), ' more_link ')]"):
             t = more_link.get_attribute("innerText")
@@ -180,35 +306,57 @@ class Checker:
         # Wait for the dashboard to fully load
         WebDriverWait(self.driver, self.TIMEOUT).until(EC.presence_of_element_located((By.CLASS_NAME, "events_list.coming_up")))
 
+        # In triage mode, read the whole to-do list from this one snapshot of the page
+        if self.TRIAGE:
+            has_assignments, assignment_urls, submission_count = dashboard.parse_dashboard(self.driver.page_source, self.driver.current_url)
+            self.dashboard_snapshot = (assignment_urls, submission_count) if has_assignments else None
+            return has_assignments
+
         # Check Dashboard, find assignments due to mark
         return "todo-list-header" in self.driver.page_source
 
 
-    # Waits up until TIMEOUT to get the submission date from an assignment.
-    def wait_for_submission(self): 
-        date_string = ""
+    # Waits up until TIMEOUT to get the submission date from an assignment. Returns an empty string if it timed out
+    def wait_for_submission(self):
+        return waits.wait_until_or_timeout(self.driver, self.TIMEOUT, submission_date, "submission date") or ""
 
-        # Keep trying to get the date for a specified duration of time
-        wait_counter = 0
-        while wait_counter < self.TIMEOUT:
-            try:
-                # Wait until the document loads, then select the most recent assignment
-                dropdown = Select(self.driver.find_element(By.ID, 'submission_to_view'))
-                date_string = dropdown.first_selected_option.text
-            except:
-                # If the element is not found, check for multiple submissions
-                element = WebDriverWait(self.driver, self.TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[@id='multiple_submissions']")))
-                date_string = element.get_attribute("innerText") # Gets assignment date
-
-            # If neither are found, keep trying for a few seconds
-            if date_string:
-                break
-            else:
-                wait_counter += 1
-                time.sleep(1)
 
-        return date_string
-    
+    # Waits until the page has finished loading and stopped changing, so it is ready for a screenshot
+    def wait_for_screenshot(self):
+        waits.wait_until_or_timeout(self.driver, self.TIMEOUT, waits.page_settled, "screenshot")
+
+
+    # Takes a screenshot of the loaded page once it is ready. If a URL is given, that page is loaded and screenshotted instead
+    def take_screenshot(self, tutor_name, number, url=None):
+        if not self.LEAN:
+            if url:
+                self.driver.get(url)
+                self.wait_for_submission()
+            self.wait_for_screenshot()
+            screenshots.screenshot(self, tutor_name, number)
+            return
+
+        # Images are blocked in this tab, so load the page again in a new tab where they are not.
+        # This also leaves the current page (and any open dropdown) as it was
+        original_window = self.driver.current_window_handle
+        url = url or self.driver.current_url
+        self.driver.switch_to.new_window("tab")
+        try:
+            self.driver.get(url)
+            self.wait_for_submission()
+            self.wait_for_screenshot()
+            screenshots.screenshot(self, tutor_name, number)
+        finally:
+            self.driver.close()
+            self.driver.switch_to.window(original_window)
+
+
+    # Opens the dropdown of students on a SpeedGrader page, and waits until the unmarked students are shown
+    def open_student_dropdown(self):
+        multiple_dropdown = self.driver.find_element(By.XPATH, "//i[contains(concat(' ', @class, ' '), ' icon-mini-arrow-down ')]")
+        multiple_dropdown.click()
+        waits.wait_until_or_timeout(self.driver, self.TIMEOUT, EC.visibility_of_element_located((By.XPATH, "//li[contains(concat(' ', @class, ' '), ' not_graded ')]")), "student dropdown")
+
 
     # Stops acting as a user
     def stop_acting_as_user(self):
@@ -216,58 +364,252 @@ class Checker:
             # We put this in a try catch, as if the user tries to stop acting as themselves, the button does not exist
             stop_button = self.driver.find_element(By.LINK_TEXT, "Stop acting as user")
             stop_button.click()
-            time.sleep(0.5)
+            waits.wait_until_or_timeout(self.driver, self.TIMEOUT, EC.staleness_of(stop_button), "stop acting as user")
         except:
             pass
 
 
-    # Checks if a loaded assignment is overdue
-    def check_assignment_overdue(self, tutor_name, tutors_list, current_tutor):
+    # Returns the name of the student whose submission is open in SpeedGrader, or an empty string if it is not shown
+    def current_student_name(self):
+        try:
+            current_student_name_span = self.driver.find_element(By.XPATH, "//span[contains(concat(' ', @class, ' '), ' ui-selectmenu-status ')]")
+            return current_student_name_span.find_element(By.CLASS_NAME, "ui-selectmenu-item-header").get_attribute("innerText")
+        except:
+            return ""
+
+
+    # Returns the cached submission time of a student's submission, or None if it has not been timed before
+    def cached_submission(self, tutors_list, current_tutor, assignment_url, student_name):
+        if self.cache is None:
+            return None
+        return self.cache.get(tutors_list[current_tutor].id, assignment_url, student_name)
+
+
+    # Adds a submission to the tutor, given its submission time. Takes a screenshot if it is overdue, of screenshot_url if given or the loaded page if not.
+    # revisit_url is a URL that opens this submission again, if it is not screenshot_url, for the dashboard fast path
+    def add_submission(self, submitted, tutor_name, tutors_list, current_tutor, assignment_url, student_name, screenshot_url=None, revisit_url=None):
+        self.walked_submissions.append((assignment_url, student_name, revisit_url or screenshot_url))
+
+        hours, days = dates.time_since_submission(submitted)
+        if hours < 0 or days < 0:
+            return
+
+        # Check if assignment is overdue if all params are valid
+        is_overdue = assignment_is_overdue(hours, days, self.USE_HOURS, self.OVERDUE_LENGTH)
+
+        if is_overdue:
+            # Take a screenshot if overdue
+            with timing.timed("screenshot"):
+                self.take_screenshot(tutor_name, tutors_list[current_tutor].get_overdue() + 1, screenshot_url)
+
+        tutors_list[current_tutor].add_assignment(hours, days, is_overdue, assignment_url, student_name, submitted)
+
+
+    # Checks if a loaded assignment is overdue, and caches its submission time. revisit_url is a URL that opens this submission again, if there is one
+    def check_assignment_overdue(self, tutor_name, tutors_list, current_tutor, assignment_url, student_name, revisit_url=None):
         date_string = self.wait_for_submission()
         if date_string:
+            submitted = dates.parse_submission_date(date_string)
+            if submitted is None:
+                self.walk_complete = False
+                return
 
-            is_overdue = False
-            hours = hours_since_submission(date_string)
-            days = calendar_days_since_submission(date_string)
+            if self.cache is not None:
+                self.cache.put(tutors_list[current_tutor].id, assignment_url, student_name, submitted)
 
-            if hours >= 0 and days >= 0:
-                # Check if assignment is overdue if all params are valid
-                if self.USE_HOURS:
-                    is_overdue = hours > self.OVERDUE_LENGTH
-                else:
-                    is_overdue = days > self.OVERDUE_LENGTH
+            self.add_submission(submitted, tutor_name, tutors_list, current_tutor, assignment_url, student_name, revisit_url=revisit_url)
+        else:
+            self.walk_complete = False
+            log(tutor_name, "COULD NOT CHECK ASSIGNMENT (Timed out waiting for page to load): %s" % (self.driver.title))
+
+
+    # Reads every student's submission from the SpeedGrader data of the loaded page, instead of opening each student.
+    # Returns a list of (student ID, student name, submission time) for unmarked submissions, or None if the data could not be read
+    def read_all_submissions(self):
+        try:
+            data = self.driver.execute_async_script(SPEEDGRADER_DATA_SCRIPT)
+        except Exception as e:
+            log("Warning", f"Could not read SpeedGrader data: {e}")
+            return None
+        if not data:
+            return None
+
+        # Canvas prefixes JSON responses with while(1); to stop them being run as scripts
+        data = json.loads(data.removeprefix("while(1);"))
+        student_names = {str(student["id"]): student.get("name", "") for student in data.get("context", {}).get("students", [])}
+
+        submissions = []
+        for submission in data.get("submissions", []):
+            if submission.get("workflow_state") in UNMARKED_STATES and submission.get("submitted_at"):
+                student_id = str(submission["user_id"])
+                submissions.append((student_id, student_names.get(student_id) or student_id, dates.parse_canvas_timestamp(submission["submitted_at"])))
+
+        return submissions
+
+
+    # Checks every unmarked submission of the loaded assignment from the SpeedGrader data. Only overdue students are opened, for their screenshot.
+    # Returns False if the data could not be read, so the students need to be checked one at a time instead
+    def check_assignment_batch(self, assignment_url, tutor_name, tutors_list, current_tutor):
+        submissions = self.read_all_submissions()
+        if submissions is None:
+            return False
+
+        for student_id, student_name, submitted in submissions:
+            if self.cache is not None:
+                self.cache.put(tutors_list[current_tutor].id, assignment_url, student_name, submitted)
+            self.add_submission(submitted, tutor_name, tutors_list, current_tutor, assignment_url, student_name, assignment_url + "&student_id=" + student_id)
+
+        return True
+
+
+    # If the tutor's dashboard is the same as when it was last walked, adds each submission from its cached time instead of opening SpeedGrader.
+    # Only overdue submissions are opened, for their screenshot. Returns False if the dashboard has changed or a cached time has expired
+    def check_unchanged_dashboard(self, fingerprint, submission_count, tutor_name, tutors_list, current_tutor):
+        tutor_id = tutors_list[current_tutor].id
+        stored_fingerprint, stored_submissions = self.cache.get_dashboard(tutor_id)
+        if stored_fingerprint != fingerprint or len(stored_submissions) != sum(submission_count):
+            return False
+
+        submissions = []
+        for assignment_url, student_name, url in stored_submissions:
+            submitted = self.cache.get(tutor_id, assignment_url, student_name)
+            if submitted is None:
+                return False
+            submissions.append((submitted, assignment_url, student_name, url))
 
-                if is_overdue:
-                    # Take a screenshot if overdue
-                    time.sleep(2)
-                    is_overdue = True
-                    screenshot(self, tutor_name, tutors_list[current_tutor].get_overdue() + 1)
+        for submitted, assignment_url, student_name, url in submissions:
+            self.add_submission(submitted, tutor_name, tutors_list, current_tutor, assignment_url, student_name, url)
+        return True
 
-                tutors_list[current_tutor].add_assignment(hours, days, is_overdue)        
+
+    # Reads the unmarked submissions of an assignment from the Canvas API, through the browser's session so as the tutor being acted as.
+    # A small JSON page, instead of SpeedGrader. Returns a list of (student ID, student name, submission time), or None if they could not be read
+    def read_unmarked_submissions(self, assignment_url):
+        url = urllib.parse.urlparse(assignment_url)
+        course = re.search(r"/courses/(\d+)", url.path)
+        assignment_id = urllib.parse.parse_qs(url.query).get("assignment_id")
+        if not course or not assignment_id:
+            return None
+
+        self.driver.get(f"{self.CANVAS_URL}/api/v1/courses/{course.group(1)}/assignments/{assignment_id[0]}/submissions?include[]=user&per_page=100")
+        try:
+            body = self.driver.find_element(By.TAG_NAME, "body").text
+            submissions = json.loads(body.removeprefix("while(1);"))
+        except Exception:
+            return None
+        if not isinstance(submissions, list):
+            return None
+
+        # Named the same way as in the SpeedGrader data, so they match the cache
+        return [(str(submission["user_id"]), submission.get("user", {}).get("name") or str(submission["user_id"]), dates.parse_canvas_timestamp(submission["submitted_at"]))
+                for submission in submissions if submission.get("workflow_state") in UNMARKED_STATES and submission.get("submitted_at")]
+
+
+    # Adds the submissions of assignments that are settled - every unmarked submission on the badge read from the API - without walking
+    # them in SpeedGrader. As with check_assignment_batch, only overdue students are opened, for their screenshot. The badge count alone cannot
+    # settle an assignment from the cache, as one student being marked and another submitting leaves it the same.
+    # Returns the URLs and counts of the assignments that still need to be walked in SpeedGrader
+    def triage_assignments(self, assignment_urls, submission_count, tutor_name, tutors_list, current_tutor):
+        open_urls = []
+        open_counts = []
+        for assignment_url, count in zip(assignment_urls, submission_count):
+            submissions = self.read_unmarked_submissions(assignment_url)
+            if submissions is not None and len(submissions) == count:
+                for student_id, student_name, submitted in submissions:
+                    if self.cache is not None:
+                        self.cache.put(tutors_list[current_tutor].id, assignment_url, student_name, submitted)
+                    self.add_submission(submitted, tutor_name, tutors_list, current_tutor, assignment_url, student_name, assignment_url + "&student_id=" + student_id)
+            else:
+                open_urls.append(assignment_url)
+                open_counts.append(count)
+
+        if len(open_urls) < len(assignment_urls):
+            log(tutor_name, f"Triage settled {len(assignment_urls) - len(open_urls)} of {len(assignment_urls)} assignments from the API")
+        return open_urls, open_counts
+
+
+    # Starts loading a URL in a new tab, without waiting for it, then goes back to the current tab. Returns the new tab's window handle
+    def open_background_tab(self, url):
+        current_window = self.driver.current_window_handle
+        self.driver.switch_to.new_window("tab")
+        handle = self.driver.current_window_handle
+
+        # Blocked URLs are set per tab, so set them before the page starts loading
+        if self.LEAN:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+
+        # Setting the location returns straight away, unlike driver.get
+        self.driver.execute_script("window.location.href = arguments[0];", url)
+        self.driver.switch_to.window(current_window)
+        return handle
+
+
+    # Loads an assignment, switching to its tab if it has already been loaded in the background. First starts loading the next
+    # TABS - 1 assignments in background tabs, so they load while this one is read. The masquerade is shared by every tab
+    def load_assignment(self, current_assignment, assignment_urls, preloaded):
+        for i in range(current_assignment + 1, min(current_assignment + self.TABS, len(assignment_urls))):
+            if i not in preloaded:
+                preloaded[i] = self.open_background_tab(assignment_urls[i])
+
+        if current_assignment in preloaded:
+            self.driver.switch_to.window(preloaded.pop(current_assignment))
         else:
-            log(tutor_name, "COULD NOT CHECK ASSIGNMENT (Timed out waiting for page to load): %s" % (self.driver.title))
+            self.driver.get(assignment_urls[current_assignment])
+
+
+    # Closes a tab (the current one if no handle is given) if it is not the main tab, and goes back to the main tab
+    def close_tab(self, main_window, handle=None):
+        try:
+            handle = handle or self.driver.current_window_handle
+            if handle != main_window:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(main_window)
+        except WebDriverException:
+            pass
 
 
     # Checks through a list of assignments
     def check_assignments(self, assignment_urls, submission_count, tutor_name, tutors_list, current_tutor):
+        self.walked_submissions = []
+        self.walk_complete = True
+
+        if self.FAST_PATH:
+            fingerprint = dashboard_fingerprint(assignment_urls, submission_count)
+            with timing.timed("fast path"):
+                if self.check_unchanged_dashboard(fingerprint, submission_count, tutor_name, tutors_list, current_tutor):
+                    log(tutor_name, "Dashboard unchanged since the last run, used cached submission times")
+                    return
+
+        if self.TRIAGE:
+            with timing.timed("triage"):
+                assignment_urls, submission_count = self.triage_assignments(assignment_urls, submission_count, tutor_name, tutors_list, current_tutor)
+
+        main_window = self.driver.current_window_handle
+        preloaded = {} # Window handles of assignments loading in background tabs, by position
+
         # Start iterating through each assignment
         for current_assignment in range(0, len(assignment_urls)):
 
             try:
                 # Try to load each assignment, wait for timeout
-                self.driver.get(assignment_urls[current_assignment])
+                self.load_assignment(current_assignment, assignment_urls, preloaded)
                 if self.wait_for_submission() == "":
+                    self.walk_complete = False
                     log(tutor_name, "COULD NOT CHECK ASSIGNMENT (Timed out waiting for page to load): %s" % (self.driver.title))
                     continue
 
+                assignment_url = assignment_urls[current_assignment]
                 if submission_count[current_assignment] == 1:
-                    # If there is only one submission for the assignment, check it and continue
-                    self.check_assignment_overdue(tutor_name, tutors_list, current_tutor)
+                    # If there is only one submission for the assignment, check it and continue. The assignment URL opens it again
+                    self.check_assignment_overdue(tutor_name, tutors_list, current_tutor, assignment_url, self.current_student_name(), assignment_url)
+                elif self.BATCH and self.check_assignment_batch(assignment_url, tutor_name, tutors_list, current_tutor):
+                    # Every submission was read in one go
+                    continue
                 else:
                     # Handle multiple submissions for the same assignment by opening dropdown, checking for multiple submissions
-                    multiple_dropdown = self.driver.find_element(By.XPATH, "//i[contains(concat(' ', @class, ' '), ' icon-mini-arrow-down ')]")
-                    multiple_dropdown.click()
-                    time.sleep(1.5)
+                    self.open_student_dropdown()
 
                     unmarked_assignments = self.driver.find_elements(By.XPATH, "//li[contains(concat(' ', @class, ' '), ' not_graded ')]")
                     
@@ -275,34 +617,74 @@ class Checker:
                     current_student_name_span = self.driver.find_element(By.XPATH, "//span[contains(concat(' ', @class, ' '), ' ui-selectmenu-status ')]")
                     current_student_name = current_student_name_span.find_element(By.CLASS_NAME, "ui-selectmenu-item-header").get_attribute("innerText")
 
-                    students = []
+                    students = set()
                     # Iterate through each student in the dropdown
                     for assignment in unmarked_assignments:
-
-                        # Reload these again as the elements may have became stale
-                        unmarked_assignments = self.driver.find_elements(By.XPATH, "//li[contains(concat(' ', @class, ' '), ' not_graded ')]")
                         student_name = assignment.find_element(By.CLASS_NAME, "ui-selectmenu-item-header").get_attribute("innerText")
 
                         # Make sure we haven't already checked this submission
                         if student_name in students:
                             continue
-                        students.append(student_name)
-                        
+                        students.add(student_name)
+
+                        # If this submission was timed on a previous run, use the cached time. The page is only loaded if it is overdue, for the screenshot
+                        if student_name != current_student_name:
+                            submitted = self.cached_submission(tutors_list, current_tutor, assignment_url, student_name)
+                            if submitted and not assignment_is_overdue(*dates.time_since_submission(submitted), self.USE_HOURS, self.OVERDUE_LENGTH):
+                                self.add_submission(submitted, tutor_name, tutors_list, current_tutor, assignment_url, student_name)
+                                continue
+
                         # Only wait if the assignment we are checking does not require a re-load
                         if student_name != current_student_name:
                             assignment.click()
+                            waits.wait_until_or_timeout(self.driver, self.TIMEOUT, waits.dom_settled, "student change")
                             if self.wait_for_submission() == "":
+                                self.walk_complete = False
                                 log(tutor_name, "COULD NOT CHECK ASSIGNMENT (Timed out waiting for page to load): %s" % (self.driver.title))
                                 continue
                         
-                        self.check_assignment_overdue(tutor_name, tutors_list, current_tutor)
+                        self.check_assignment_overdue(tutor_name, tutors_list, current_tutor, assignment_url, student_name)
 
                         # Re-click the dropdown if the page requires a re-load
                         if student_name != current_student_name:
-                            multiple_dropdown = self.driver.find_element(By.XPATH, "//i[contains(concat(' ', @class, ' '), ' icon-mini-arrow-down ')]")
-                            multiple_dropdown.click()
-                            time.sleep(1.5)                    
+                            self.open_student_dropdown()
 
             except Exception as e:
+                # If the browser has died, every other assignment would fail too, so leave it to the caller
+                if not self.is_alive():
+                    raise
+                self.walk_complete = False
                 log(tutor_name, f"Error checking assignment: " + str(e))
-        
\ No newline at end of file
+            finally:
+                # Close the background tab this assignment was read in
+                if self.TABS > 1:
+                    self.close_tab(main_window)
+
+        # Close any background tabs left open by errors
+        for handle in preloaded.values():
+            self.close_tab(main_window, handle)
+
+        # Store the dashboard for the fast path, if every submission on it was found and can be opened again for a screenshot
+        if self.FAST_PATH and self.walk_complete and all(url for assignment_url, student_name, url in self.walked_submissions):
+            self.cache.put_dashboard(tutors_list[current_tutor].id, fingerprint, self.walked_submissions)
+
+
+# Loads a page (eg a saved SpeedGrader page) with and without the lean profile, and logs how long it took to load with each
+def compare_lean_profile(options_array, timeout, url, runs):
+    for lean in (False, True):
+        Driver = Checker(options_array, timeout, "", False, 0, lean=lean)
+
+        # Load from the network every time, so the comparison is fair
+        Driver.driver.execute_cdp_cmd("Network.enable", {})
+        Driver.driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+
+        load_times = []
+        for i in range(0, runs):
+            start = time.perf_counter()
+            Driver.driver.get(url)
+            waits.wait_until_or_timeout(Driver.driver, timeout, waits.network_idle, "lean profile comparison")
+            load_times.append(time.perf_counter() - start)
+        Driver.quit()
+
+        profile_name = "Lean profile" if lean else "Default profile"
+        log("Profile comparison", f"{profile_name}: {sum(load_times) / len(load_times):.2f}s average, {min(load_times):.2f}s fastest over {runs} loads of {url}")
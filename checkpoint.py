@@ -0,0 +1,102 @@
+# Description: Saves the results of each tutor as soon as they are checked, so an interrupted sweep can be resumed
+
+import json
+import threading
+
+# Custom modules
+from utils import *
+
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+# Returns True if the output directory holds a sweep of the whole roster that finished every tutor. Worker and daemon directories have no checkpoint
+def is_complete_run(run_dir):
+    checkpoint_path = os.path.join(run_dir, CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_path):
+        return False
+    with open(checkpoint_path) as f:
+        data = json.load(f)
+    return bool(data.get("complete")) and not data.get("partial")
+
+
+# Returns the most recent output directory with an unfinished sweep, or None if there are none
+def find_unfinished_run(output_root="output"):
+    if not os.path.isdir(output_root):
+        return None
+
+    for run_dir in sorted(os.listdir(output_root), reverse=True):
+        checkpoint_path = os.path.join(output_root, run_dir, CHECKPOINT_FILE)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                if not json.load(f).get("complete"):
+                    return os.path.join(output_root, run_dir)
+
+    return None
+
+
+class Checkpoint:
+
+    # Loads the checkpoint in the output directory, if there is one
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.lock = threading.Lock() # Workers save their tutors as they finish
+        self.records = {} # Finished tutors by ID, each with its position in the tutor list, output text, and data
+        self.complete = False
+        self.partial = False # True if only some of the roster was selected, eg with --only or --shard
+        self.selection = None # The --only, --exclude, --tag and --shard the sweep was started with. None for checkpoints saved before it was kept
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.records = data["tutors"]
+            self.complete = data.get("complete", False)
+            self.partial = data.get("partial", False)
+            self.selection = data.get("selection")
+
+
+    # Writes the checkpoint to disk. Written to a temporary file first, so a crash mid-write does not lose the checkpoint
+    def write(self):
+        finished = sorted(record["position"] for record in self.records.values())
+        data = {
+            "complete": self.complete,
+            "partial": self.partial,
+            "selection": self.selection,
+            "next_position": next((i for i, position in enumerate(finished) if i != position), len(finished)),
+            "tutors": self.records,
+        }
+
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temporary_path, self.path)
+
+
+    # Returns True if the tutor was finished before the sweep was interrupted
+    def is_done(self, tutor_id):
+        return str(tutor_id) in self.records
+
+
+    # Records a finished tutor. written is True if its result has already been written to the output file
+    def save(self, tutor, position, result, written):
+        with self.lock:
+            self.records[str(tutor.id)] = {"position": position, "result": result, "written": written, "tutor": tutor.to_dict()}
+            self.write()
+
+
+    # Returns the finished records that have not had their result written to the output file, then marks them as written
+    def take_unwritten(self):
+        with self.lock:
+            unwritten = [record for record in self.records.values() if not record["written"]]
+            for record in unwritten:
+                record["written"] = True
+            self.write()
+
+        return sorted(unwritten, key=lambda record: record["position"])
+
+
+    # Marks the sweep as finished, so it is not picked up by --resume
+    def finish(self):
+        with self.lock:
+            self.complete = True
+            self.write()
@@ -0,0 +1,257 @@
+# Description: Keeps a pool of logged in checkers running, and checks tutors on request over a local HTTP API, streaming each result back
+# as it finishes. Saves the start up and login of a full run when only a few tutors need checking.
+#   POST /sweep             Checks every tutor, or the tutors (IDs or names) in a JSON body like {"tutors": ["1234", "Jane Smith"]}
+#   GET  /check/<tutor>     Checks a single tutor, by ID or name
+#   GET  /status            The size of the pool and how many checkers are free
+# Results are streamed as one JSON object per line, with an error instead of a result for a tutor that could not be checked, ending with {"done": true, ...}
+
+import contextlib
+import http.server
+import itertools
+import json
+import queue
+import threading
+import time
+import urllib.parse
+
+# Custom modules
+from utils import *
+
+
+DAEMON_PORT = 8700
+KEEP_WARM_INTERVAL = 600 # Seconds between checks that idle checkers are still running and logged in
+
+tutor_locks = {} # Tutor ID -> lock held while the tutor is being checked, so two requests never check the same tutor at once
+tutor_locks_lock = threading.Lock()
+
+
+# Returns the lock for a tutor, making it if needed
+def tutor_lock(tutor_id):
+    with tutor_locks_lock:
+        return tutor_locks.setdefault(str(tutor_id), threading.Lock())
+
+
+class CheckerPool:
+
+    # Starts size checkers with create_checker(worker number), which should return a logged in checker. They are started at once, as each has to log in
+    def __init__(self, size, create_checker):
+        self.size = size
+        self.idle = queue.Queue()
+
+        def start(worker_number):
+            try:
+                self.idle.put(create_checker(worker_number))
+            except BaseException as e:
+                # Checker calls sys.exit() on fatal errors, which only ends this thread
+                log("Daemon", f"Could not start checker {worker_number}: {e}")
+
+        starters = [threading.Thread(target=start, args=(i + 1,)) for i in range(0, size)]
+        for starter in starters:
+            starter.start()
+        for starter in starters:
+            starter.join()
+        self.size = self.idle.qsize()
+
+
+    # Lends a checker for the length of the with block, waiting for one to be free if needed
+    @contextlib.contextmanager
+    def borrow(self):
+        Driver = self.idle.get()
+        try:
+            yield Driver
+        finally:
+            self.idle.put(Driver)
+
+
+    # Restarts an idle supervised checker if its browser has stopped or its session has expired. Also keeps the canvas session in use
+    def refresh(self, Supervisor):
+        reason = Supervisor.needs_restart()
+        if not reason and hasattr(Supervisor.Driver, "logged_in_user_id") and Supervisor.Driver.logged_in_user_id() is None:
+            reason = "session expired"
+        if reason:
+            Supervisor.restart(reason)
+
+
+    # Background thread. Every KEEP_WARM_INTERVAL, refreshes each checker that is not being used
+    def keep_warm(self):
+        while True:
+            time.sleep(KEEP_WARM_INTERVAL)
+            for i in range(0, self.size):
+                try:
+                    Supervisor = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self.refresh(Supervisor)
+                except Exception as e:
+                    log("Daemon", f"Could not refresh checker: {e}")
+                finally:
+                    self.idle.put(Supervisor)
+
+
+    def quit(self):
+        for i in range(0, self.size):
+            self.idle.get().quit()
+
+
+# Checks tutors with the pool, calling on_finished(position, output text, error) from a pool thread as each one finishes. error is None unless
+# checking the tutor failed, in which case the tutor's partial results are thrown away. Uses up to one thread per checker, each borrowing a
+# checker per tutor, so requests running at the same time share the pool. A tutor already being checked by another request is waited for,
+# then checked again, before a checker is borrowed
+def check_tutors(checker_pool, check_tutor, tutors, on_finished):
+    positions = queue.Queue()
+    for current_tutor in range(0, len(tutors)):
+        positions.put(current_tutor)
+
+    def worker():
+        while True:
+            try:
+                current_tutor = positions.get_nowait()
+            except queue.Empty:
+                return
+
+            with tutor_lock(tutors[current_tutor].id), checker_pool.borrow() as Driver:
+                try:
+                    result = check_tutor(Driver, tutors, current_tutor)
+                except Exception as e:
+                    log(tutors[current_tutor].name, f"Error checking tutor: {e}")
+                    # The checker goes back to the pool, so it must not still be acting as the tutor
+                    tutors[current_tutor].reset()
+                    try:
+                        Driver.stop_acting_as_user()
+                    except Exception:
+                        pass
+                    on_finished(current_tutor, None, str(e))
+                    continue
+            on_finished(current_tutor, result, None)
+
+    workers = [threading.Thread(target=worker, daemon=True) for i in range(0, min(checker_pool.size, len(tutors)))]
+    for thread in workers:
+        thread.start()
+    return workers
+
+
+class DaemonHandler(http.server.BaseHTTPRequestHandler):
+    checker_pool = None
+    check_tutor = None
+    load_tutors = None # Returns a new list of Tutors for the whole roster
+    start_request = None # Called with the request number when a sweep starts. Returns the request's run ID in the history
+    on_result = None # Called with (run ID, tutor, output text) as each tutor is checked. Not called for tutors that could not be checked
+    finish_request = None # Called with the run ID once every tutor of a sweep has been checked
+    request_numbers = None
+    started_at = None
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+
+        if path == "/status":
+            return self.send_json(200, {"checkers": self.checker_pool.size, "free": self.checker_pool.idle.qsize(), "uptime": round(time.time() - self.started_at)})
+
+        if path.startswith("/check/"):
+            return self.sweep([urllib.parse.unquote(path[len("/check/"):])])
+
+        self.send_json(404, {"error": "Unknown request"})
+
+
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path != "/sweep":
+            return self.send_json(404, {"error": "Unknown request"})
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            selected = json.loads(body).get("tutors") if body else None
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+            selected = False
+        if selected is False or (selected is not None and not (isinstance(selected, list) and all(isinstance(tutor, str) for tutor in selected))):
+            return self.send_json(400, {"error": "Body must be JSON with a list of tutor IDs or names, like {\"tutors\": [\"1234\", \"Jane Smith\"]}"})
+        self.sweep(selected)
+
+
+    # Checks the selected tutors (by ID or name), or every tutor if none are given, streaming each result as it finishes
+    def sweep(self, selected):
+        tutors = self.load_tutors()
+        if selected is not None:
+            wanted = {str(tutor) for tutor in selected}
+            tutors = [tutor for tutor in tutors if str(tutor.id) in wanted or tutor.name in wanted]
+            if not tutors:
+                return self.send_json(404, {"error": "No matching tutors"})
+
+        start = time.perf_counter()
+        run_id = self.start_request(next(self.request_numbers))
+        finished = queue.Queue()
+        check_tutors(self.checker_pool, self.check_tutor, tutors, lambda current_tutor, result, error: finished.put((current_tutor, result, error)))
+
+        # Streamed until the connection closes, so there is no content length
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        failed = 0
+        for i in range(0, len(tutors)):
+            current_tutor, result, error = finished.get()
+            tutor = tutors[current_tutor]
+            if error is not None:
+                failed += 1
+                self.write_line({"id": tutor.id, "tutor": tutor.name, "error": error})
+                continue
+            self.on_result(run_id, tutor, result)
+            self.write_line({"id": tutor.id, "tutor": tutor.name, "result": result, "overdue": tutor.get_overdue(), "submissions": len(tutor.hours_since_submission)})
+
+        # As with a sweep, a run is only finished in the history once every tutor has been checked
+        if not failed:
+            self.finish_request(run_id)
+        self.write_line({"done": True, "checked": len(tutors) - failed, "failed": failed, "seconds": round(time.perf_counter() - start, 1)})
+
+
+    def write_line(self, data):
+        try:
+            self.wfile.write((json.dumps(data) + "\n").encode())
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away. The tutors are still checked, and their results written
+            pass
+
+
+    def send_json(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+    def log_message(self, format, *args):
+        log("Daemon", f"{self.address_string()} - {format % args}")
+
+
+# Starts pool_size checkers, then answers requests on localhost until interrupted
+def serve(port, pool_size, create_checker, check_tutor, load_tutors, start_request, on_result, finish_request):
+    log("Daemon", f"Starting {pool_size} checkers")
+    checker_pool = CheckerPool(pool_size, create_checker)
+    if checker_pool.size == 0:
+        log("Fatal error", "Could not start any checkers")
+        sys.exit()
+    threading.Thread(target=checker_pool.keep_warm, daemon=True).start()
+
+    handler = type("Handler", (DaemonHandler,), {
+        "checker_pool": checker_pool,
+        "check_tutor": staticmethod(check_tutor),
+        "load_tutors": staticmethod(load_tutors),
+        "start_request": staticmethod(start_request),
+        "on_result": staticmethod(on_result),
+        "finish_request": staticmethod(finish_request),
+        "request_numbers": itertools.count(1),
+        "started_at": time.time(),
+    })
+    # Only listen on localhost, as anyone who can reach the API can check any tutor
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    log("Daemon", f"Ready on http://127.0.0.1:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        checker_pool.quit()
@@ -0,0 +1,86 @@
+# Description: Reads the to-do list from a single snapshot of the dashboard HTML, instead of searching the live page once per element
+
+import html.parser
+import urllib.parse
+
+# Optional - a faster parser. Without it, the dashboard is read with python's built in HTML parser
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Custom modules
+from utils import *
+
+
+# Returns True if the element's class attribute contains the given class
+def has_class(class_attribute, name):
+    return name in (class_attribute or "").split()
+
+
+# Reads the dashboard with the built in parser. Collects the to-do header, and the link and first badge number of each to-do item
+class DashboardParser(html.parser.HTMLParser):
+
+    def __init__(self):
+        super().__init__()
+        self.has_header = False
+        self.items = [] # [URL, badge text] of each to-do item
+        self.in_item = False
+        self.in_badge = False
+        self.reading_badge = False # True while inside the first span of the current badge
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if has_class(attrs.get("class"), "todo-list-header"):
+            self.has_header = True
+
+        if tag == "li" and has_class(attrs.get("class"), "todo"):
+            self.in_item = True
+            self.items.append([None, ""])
+        elif self.in_item and tag == "a" and self.items[-1][0] is None:
+            self.items[-1][0] = attrs.get("href")
+        elif self.in_item and tag == "div" and has_class(attrs.get("class"), "todo-badge"):
+            self.in_badge = True
+        elif self.in_badge and tag == "span" and not self.items[-1][1]:
+            self.reading_badge = True
+
+    def handle_endtag(self, tag):
+        if tag == "span":
+            self.reading_badge = False
+        elif tag == "div":
+            self.in_badge = False
+        elif tag == "li":
+            self.in_item = False
+
+    def handle_data(self, data):
+        if self.reading_badge:
+            self.items[-1][1] += data.strip()
+
+
+# Reads the dashboard HTML. Returns whether there is a to-do list, the URL of each to-do item, and how many submissions are behind each.
+# Every item is read, including those hidden behind the "more..." link. URLs are made absolute using page_url
+def parse_dashboard(page_source, page_url):
+    if lxml is not None:
+        document = lxml.html.fromstring(page_source)
+        has_header = bool(document.xpath("//*[contains(concat(' ', normalize-space(@class), ' '), ' todo-list-header ')]"))
+        items = []
+        for item in document.xpath("//li[contains(concat(' ', normalize-space(@class), ' '), ' todo ')]"):
+            links = item.xpath(".//a/@href")
+            badges = item.xpath(".//div[contains(concat(' ', normalize-space(@class), ' '), ' todo-badge ')]/span[1]")
+            items.append([links[0] if links else None, badges[0].text_content().strip() if badges else ""])
+    else:
+        parser = DashboardParser()
+        parser.feed(page_source)
+        parser.close()
+        has_header, items = parser.has_header, parser.items
+
+    assignment_urls = []
+    submission_count = []
+    for url, badge in items:
+        if not url:
+            continue
+        assignment_urls.append(urllib.parse.urljoin(page_url, url))
+        digits = "".join(character for character in badge if character.isdigit())
+        submission_count.append(int(digits) if digits else 1)
+
+    return has_header, assignment_urls, submission_count
@@ -3,8 +3,28 @@
 
 VERSION = "2.B" 
 
+import argparse
+import array
+
 # Local module imports
+import async_engine
+import cache
+import canvas_api
 import checker
+import checkpoint
+import daemon
+import history
+import metrics
+import pool
+import results
+import roster
+import schedule
+import screenshots
+import sessions
+import stats
+import supervisor
+import timing
+import workqueue
 from utils import *
 
 
@@ -13,6 +33,23 @@ CANVAS_URL = "https://wolseyhalloxford.instructure.com" # Canvas URL eg https://
 OVERDUE_LENGTH = 5 # How many either hours / days since submission until the assigmment is overdue
 USE_HOURS = False # If True, uses hours since submission. If False, uses calendar days
 TIMEOUT = 10 # How many seconds (maximum) to wait for a large assignment to load
+CACHE_FILE = "submission_cache.db" # Where submission times are cached between runs
+CACHE_TTL = 24 # How many hours a cached submission time is used for before the submission is checked again
+HISTORY_FILE = "history.db" # Where the results of every run are kept, to be queried with history.py
+LEAN_PROFILE = True # If True, chrome does not load images (except for screenshots), fonts, document previews or analytics scripts
+BATCH_SUBMISSIONS = True # If True, reads every student's submission time on an assignment at once, only opening overdue students
+FAST_PATH = True # If True, tutors whose dashboard has not changed since the last run are checked from cached submission times. Needs the cache
+RECYCLE_EVERY = 25 # Restart the browser after checking this many tutors, to keep its memory use down. 0 to never restart on a schedule
+MAX_BROWSER_MEMORY = 1500 # Restart the browser if it is using more than this many MB of memory. 0 for no limit
+REUSE_SESSIONS = True # If True, saves the logged in session and reuses it on the next run instead of filling in the login form
+SESSION_NAME = "worker" # Saved sessions are named this and the worker number. The daemon and --worker processes use their own names, so they never share a session with a sweep
+TABS = 1 # How many assignments to load at once while acting as a tutor, each in its own tab. 1 loads them one at a time
+TRIAGE = False # If True, reads the dashboard once and reads each assignment's unmarked submissions from the API, only opening overdue submissions for their screenshot
+PRIORITY_ORDER = True # If True, tutors and assignments most likely to be overdue are checked first, and results are written as each tutor finishes
+DATA_SOURCE = "browser" # Where to read assignments from. "browser" scrapes the pages, "api" uses the Canvas REST API (needs an API token in token.txt), "async" uses the API for many tutors at once
+ASYNC_CONCURRENCY = 20 # Most API requests in flight at once with the async source
+ASYNC_RATE_LIMIT = 50 # Most API requests started per second with the async source. 0 for no limit. Much lower and the limit, not the concurrency, sets the pace
+METRICS_PORT = 0 # Port to serve live OpenMetrics (Prometheus) metrics of the sweep on, at /metrics. 0 for no metrics server
 
 
 
@@ -25,26 +62,33 @@ options_array = [
     "window-size=1920,1080"
 ]
 
-# Holds information about a tutor, and all of their assignments
+submission_cache = None # Submission times from previous runs, shared between all checkers. Set up on start
+run_history = None # Results of every run, added to as each tutor finishes. Set up on start
+
+# Holds information about a tutor, and all of their assignments. Kept in arrays rather than lists, as every tutor is held in memory for the whole sweep
 class Tutor:
 
+    __slots__ = ("name", "id", "overdue_time_since_submission", "calendar_days_since_submission", "hours_since_submission")
+
     def __init__(self, name, id):
         self.name = name
         self.id = id
-        self.overdue_time_since_submission = [] # List of overdue time since submission for each assignment. This is either hours or days
-        self.calendar_days_since_submission = [0] * 13 # List of calendar days since submission for each assignment. 0-11, 12+
-        self.hours_since_submission = [] # List of hours since submission for each assignment
+        self.overdue_time_since_submission = array.array("d") # Overdue time since submission for each assignment. This is either hours or days
+        self.calendar_days_since_submission = array.array("l", [0] * (len(stats.DAY_BUCKETS) + 1)) # Number of assignments in each calendar day bucket, eg 0-11, 12+
+        self.hours_since_submission = array.array("d") # Hours since submission for each assignment
 
 
-    # Adds an assignment to the list
-    def add_assignment(self, hours_since_submission, calendar_days_since_submission, overdue):
+    # Adds an assignment to the list, and to the results file if the assignment, student and submission time are given
+    def add_assignment(self, hours_since_submission, calendar_days_since_submission, overdue, assignment_url=None, student=None, submitted=None):
         global USE_HOURS
 
+        results.add(self, assignment_url, student, submitted, hours_since_submission, calendar_days_since_submission, overdue)
+        metrics.inc("submissions_checked")
+        if overdue:
+            metrics.inc("overdue_found")
+
         self.hours_since_submission.append(hours_since_submission)
-        if calendar_days_since_submission < 12:
-            self.calendar_days_since_submission[calendar_days_since_submission] += 1
-        else:
-            self.calendar_days_since_submission[12] += 1
+        self.calendar_days_since_submission[stats.day_bucket(calendar_days_since_submission)] += 1
 
         if overdue:
             if USE_HOURS:
@@ -65,46 +109,371 @@ class Tutor:
         return round(sum(self.hours_since_submission) / len(self.hours_since_submission))
 
 
-# Application entry point
-if __name__ == "__main__":
+    # Clears all assignments, so the tutor can be checked again from the start
+    def reset(self):
+        results.discard(self)
+        self.overdue_time_since_submission = array.array("d")
+        self.calendar_days_since_submission = array.array("l", [0] * (len(stats.DAY_BUCKETS) + 1))
+        self.hours_since_submission = array.array("d")
 
-    configure_outputs()
-    log("Wolsey Hall Oxford", "Dashboard Checker - Version %s" % (VERSION))
 
-    if True:
-        # Create chrome driver instance
-        Driver = checker.Checker(options_array, TIMEOUT, CANVAS_URL, USE_HOURS, OVERDUE_LENGTH)
-
-        # Log in as admin user
-        Driver.login("account.txt")
-
-        userIDs, tutor_names = load_json("tutors.json")
-        # List of tutor classes to store data
-        tutors = []
-        for i in range(0, len(userIDs)):
-            tutors.append(Tutor(tutor_names[i], userIDs[i]))
-
-        # Loop through each user in the JSON file
-        for current_tutor in range(0, len(userIDs)):
-            # Try to masquerade as user
-            if Driver.act_as_user(userIDs[current_tutor], tutor_names[current_tutor]):
-                # Check Dashboard, find assignments due to mark
-                if not Driver.dashboard_has_assignments():
-                    output(tutor_names[current_tutor], "No Items on dashboard")
-                else:
-                    # Check all assignments on the dashboard
+    # Returns the tutor's data as a dictionary, to be saved in a checkpoint
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "id": self.id,
+            "overdue_time_since_submission": self.overdue_time_since_submission.tolist(),
+            "calendar_days_since_submission": self.calendar_days_since_submission.tolist(),
+            "hours_since_submission": self.hours_since_submission.tolist(),
+        }
+
+
+    # Restores the tutor's data from a dictionary made by to_dict
+    def restore(self, data):
+        self.overdue_time_since_submission = array.array("d", data["overdue_time_since_submission"])
+        self.calendar_days_since_submission = array.array("l", data["calendar_days_since_submission"])
+        self.hours_since_submission = array.array("d", data["hours_since_submission"])
+
+
+# Checks a single tutor's dashboard. Returns the text to output against the tutor, or None if we could not act as them
+def check_tutor(Driver, tutors, current_tutor):
+    tutor = tutors[current_tutor]
+    result = None
+    timing.set_tutor(tutor.name)
+
+    with timing.timed("tutor total"):
+        # Try to masquerade as user
+        with timing.timed("act_as_user"):
+            acting = Driver.act_as_user(tutor.id, tutor.name)
+
+        if acting:
+            # Check Dashboard, find assignments due to mark
+            with timing.timed("dashboard_has_assignments"):
+                has_assignments = Driver.dashboard_has_assignments()
+
+            if not has_assignments:
+                result = "No Items on dashboard"
+            else:
+                # Check all assignments on the dashboard
+                with timing.timed("get_dashboard_assignments"):
                     assignment_urls, submission_count = Driver.get_dashboard_assignments()
-                    Driver.check_assignments(assignment_urls, submission_count, tutor_names[current_tutor], tutors, current_tutor) 
+                if PRIORITY_ORDER:
+                    assignment_urls, submission_count = schedule.order_assignments(tutor.id, assignment_urls, submission_count, submission_cache)
+                with timing.timed("check_assignments"):
+                    Driver.check_assignments(assignment_urls, submission_count, tutor.name, tutors, current_tutor)
 
-                    # Write number of overdue assignments to output file
-                    output(tutor_names[current_tutor], f"Assignments overdue: {tutors[current_tutor].get_overdue()}")
+                # Number of overdue assignments to write to the output file
+                result = f"Assignments overdue: {tutor.get_overdue()}"
 
-                # Stop acting as user
+            # Stop acting as user
+            with timing.timed("stop_acting_as_user"):
                 Driver.stop_acting_as_user()
 
+    timing.set_tutor(None)
+    return result
+
 
-    #except Exception as e:
-    #  log("Error", e)
+# Creates a checker for the chosen data source, and logs in as the admin user. Each worker number keeps its own saved session
+def create_checker(worker_number=1):
+    if DATA_SOURCE == "api":
+        Driver = canvas_api.APIChecker(options_array, TIMEOUT, CANVAS_URL, USE_HOURS, OVERDUE_LENGTH)
+    else:
+        Driver = checker.Checker(options_array, TIMEOUT, CANVAS_URL, USE_HOURS, OVERDUE_LENGTH, submission_cache, LEAN_PROFILE, BATCH_SUBMISSIONS, FAST_PATH, TRIAGE, TABS)
 
+    with timing.timed("login"):
+        Driver.login("account.txt", session_store(worker_number))
+    return Driver
 
+
+# Returns the saved session of a worker, or None if sessions are not being reused
+def session_store(worker_number):
+    if not REUSE_SESSIONS:
+        return None
+    return sessions.SessionStore(f"{SESSION_NAME}-{worker_number}")
+
+
+# Creates a checker which is restarted every RECYCLE_EVERY tutors, when it uses more than MAX_BROWSER_MEMORY, or when it dies
+def create_supervised_checker(worker_number=1):
+    return supervisor.SupervisedChecker(lambda: create_checker(worker_number), RECYCLE_EVERY, MAX_BROWSER_MEMORY)
+
+
+# Checks a tutor through a supervised checker, which retries the tutor if the browser dies
+def check_tutor_supervised(Supervisor, tutors, current_tutor):
+    return Supervisor.check(check_tutor, tutors, current_tutor)
+
+
+# Writes the results of finished tutors that have not been written to the output file yet, in the same order as the tutors file
+def write_unwritten(run_checkpoint):
+    for record in run_checkpoint.take_unwritten():
+        if record["result"]:
+            output(record["tutor"]["name"], record["result"])
+
+
+# Waits for the last screenshots to be written, then closes the results file, writes the profile report and closes the databases
+def shut_down(output_dir, parquet):
+    screenshots.close()
+    results.close(parquet)
+    timing.write_report(output_dir)
+    if submission_cache:
+        submission_cache.close()
+    if run_history:
+        run_history.close()
     log("Status", "Application exited cleanly")
+
+
+# Application entry point
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Checks tutor dashboards for overdue marking")
+    parser.add_argument("--workers", type=int, default=1, help="Number of chrome instances to check tutors with in parallel (default 1)")
+    parser.add_argument("--source", choices=["browser", "api", "async"], default=DATA_SOURCE, help=f"Where to read assignments from (default {DATA_SOURCE})")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY, help=f"Most API requests in flight at once with --source async (default {ASYNC_CONCURRENCY})")
+    parser.add_argument("--rate-limit", type=float, default=ASYNC_RATE_LIMIT, help=f"Most API requests per second with --source async, 0 for no limit (default {ASYNC_RATE_LIMIT})")
+    parser.add_argument("--coordinator", action="store_true", help="Put the tutors on the work queue and collect the results of --worker processes, instead of checking them here")
+    parser.add_argument("--worker", action="store_true", help="Check tutors from the work queue until it is empty, instead of from tutors.json")
+    parser.add_argument("--daemon", action="store_true", help="Keep --workers checkers logged in, and check tutors when asked over a local HTTP API, instead of sweeping once")
+    parser.add_argument("--port", type=int, default=daemon.DAEMON_PORT, help=f"Port for --daemon to listen on, on localhost only (default {daemon.DAEMON_PORT})")
+    parser.add_argument("--worker-id", help="Name to save this --worker's session under, unique to each worker on the machine. Without it, the worker logs in with the login form")
+    parser.add_argument("--queue", default=workqueue.QUEUE_FILE, help=f"Work queue database shared by the coordinator and workers (default {workqueue.QUEUE_FILE})")
+    parser.add_argument("--only", action="extend", nargs="+", metavar="TUTOR", help="Only check these tutors, by ID or name")
+    parser.add_argument("--exclude", action="extend", nargs="+", metavar="TUTOR", help="Do not check these tutors, by ID or name")
+    parser.add_argument("--tag", action="extend", nargs="+", help="Only check tutors with any of these tags or departments in tutors.json")
+    parser.add_argument("--shard", metavar="I/N", help="Only check the I'th of N even shares of the roster, eg 1/3, 2/3 and 3/3 on three machines")
+    parser.add_argument("--refresh", action="store_true", help="Clear the submission cache, so every submission is checked again")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the submission cache")
+    parser.add_argument("--no-history", action="store_true", help="Do not add this run to the run history")
+    parser.add_argument("--no-lean", action="store_true", help="Load every resource on each page, instead of using the lean profile")
+    parser.add_argument("--no-fast-path", action="store_true", help="Walk every tutor's submissions, even if their dashboard has not changed since the last run")
+    parser.add_argument("--tabs", type=int, default=TABS, help=f"Load this many of a tutor's assignments at once, each in its own tab (default {TABS})")
+    parser.add_argument("--triage", action="store_true", help="Read each dashboard once, and read each assignment's unmarked submissions from the API, only opening overdue submissions in SpeedGrader for their screenshot")
+    parser.add_argument("--no-batch", action="store_true", help="Open each student on assignments with multiple submissions, instead of reading them all at once")
+    parser.add_argument("--screenshot-format", choices=["webp", "jpeg", "png"], default=screenshots.SCREENSHOT_FORMAT, help=f"Format to save screenshots in (default {screenshots.SCREENSHOT_FORMAT})")
+    parser.add_argument("--screenshot-quality", type=int, default=screenshots.SCREENSHOT_QUALITY, help=f"Quality of webp and jpeg screenshots, 1-100 (default {screenshots.SCREENSHOT_QUALITY})")
+    parser.add_argument("--full-screenshots", action="store_true", help="Screenshot the whole page, instead of cropping to the submission panel")
+    parser.add_argument("--compare-lean", metavar="URL", help="Compare load times of a page (eg a saved SpeedGrader page) with and without the lean profile, then exit")
+    parser.add_argument("--compare-runs", type=int, default=5, help="How many times to load the page when comparing profiles (default 5)")
+    parser.add_argument("--recycle-every", type=int, default=RECYCLE_EVERY, help=f"Restart the browser after this many tutors, 0 for never (default {RECYCLE_EVERY})")
+    parser.add_argument("--max-browser-memory", type=int, default=MAX_BROWSER_MEMORY, help=f"Restart the browser when it uses more than this many MB, 0 for no limit (default {MAX_BROWSER_MEMORY})")
+    parser.add_argument("--file-order", action="store_true", help="Check tutors in the order of tutors.json, and write the results in that order at the end, instead of most likely overdue first")
+    parser.add_argument("--fresh-login", action="store_true", help="Log in with the login form, instead of reusing a saved session")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="OUTPUT_DIR", help="Carry on an interrupted sweep, skipping tutors it already finished. Uses the latest unfinished run if no directory is given")
+    parser.add_argument("--results-format", choices=["jsonl", "csv", "none"], default=results.RESULTS_FORMAT, help=f"Format to write a record of every checked submission in (default {results.RESULTS_FORMAT})")
+    parser.add_argument("--parquet", action="store_true", help="Also export the results to Parquet at the end of the sweep (needs pyarrow)")
+    parser.add_argument("--day-buckets", help="Upper bounds of the calendar day buckets in stats.json, eg 0,1,2,3,5,7,14 (default 0-11, then 12+)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="Serve live OpenMetrics (Prometheus) metrics of the sweep on this port, at /metrics (default off)")
+    parser.add_argument("--canvas-url", default=CANVAS_URL, help="Canvas URL, eg a local stub_canvas.py server for testing")
+    args = parser.parse_args()
+
+    DATA_SOURCE = args.source
+    CANVAS_URL = args.canvas_url
+    LEAN_PROFILE = LEAN_PROFILE and not args.no_lean
+    BATCH_SUBMISSIONS = BATCH_SUBMISSIONS and not args.no_batch
+    FAST_PATH = FAST_PATH and not args.no_fast_path
+    TRIAGE = TRIAGE or args.triage
+    TABS = args.tabs
+    RECYCLE_EVERY = args.recycle_every
+    MAX_BROWSER_MEMORY = args.max_browser_memory
+    REUSE_SESSIONS = REUSE_SESSIONS and not args.fresh_login
+    if args.worker:
+        # Several workers can run on one machine, and only the user knows which are running at once
+        REUSE_SESSIONS = REUSE_SESSIONS and bool(args.worker_id)
+        SESSION_NAME = f"queue-worker-{args.worker_id}"
+    elif args.daemon:
+        SESSION_NAME = "daemon"
+    PRIORITY_ORDER = PRIORITY_ORDER and not args.file_order
+
+    resume_dir = None
+    if args.resume:
+        resume_dir = checkpoint.find_unfinished_run() if args.resume == "latest" else args.resume
+        if not resume_dir or not os.path.isdir(resume_dir):
+            print("Fatal error: Could not find an unfinished sweep to resume")
+            sys.exit()
+
+    output_dir = configure_outputs(resume_dir)
+    log("Wolsey Hall Oxford", "Dashboard Checker - Version %s" % (VERSION))
+
+    shard = roster.parse_shard(args.shard) if args.shard else None
+
+    if args.day_buckets:
+        stats.configure([int(bucket) for bucket in args.day_buckets.split(",")])
+    # Workers send their records back to the coordinator with each tutor, which writes the results of the whole sweep
+    results.configure(output_dir, None if args.results_format == "none" or args.worker else args.results_format)
+    screenshots.configure(args.screenshot_format, args.screenshot_quality, None if args.full_screenshots else screenshots.CROP_SELECTOR)
+
+    if args.compare_lean:
+        checker.compare_lean_profile(options_array, TIMEOUT, args.compare_lean, args.compare_runs)
+        sys.exit()
+
+    if args.workers < 1:
+        log("Fatal error", "The number of workers must be at least 1")
+        sys.exit()
+    elif args.workers > (os.cpu_count() or 1):
+        log("Warning", f"Using {args.workers} workers on {os.cpu_count()} CPU cores, the sweep will not get much faster past one worker per core")
+
+    if args.metrics_port:
+        metrics.start(args.metrics_port)
+
+    if not args.no_cache:
+        submission_cache = cache.SubmissionCache(CACHE_FILE, CACHE_TTL)
+        if args.refresh:
+            submission_cache.clear()
+
+    if args.worker:
+        work_queue = workqueue.WorkQueue(args.queue)
+        workqueue.run_worker(work_queue, create_supervised_checker, check_tutor_supervised, Tutor, results.write_tutor)
+        work_queue.close()
+
+        shut_down(output_dir, args.parquet)
+        sys.exit()
+
+    if not args.no_history:
+        run_history = history.RunHistory(HISTORY_FILE)
+
+    if args.daemon:
+        if DATA_SOURCE == "async":
+            log("Fatal error", "The daemon needs checkers to keep logged in, use --source browser or --source api")
+            sys.exit()
+
+        # tutors.json is read for each request, so tutors can be added without restarting the daemon
+        def load_tutors():
+            entries = roster.load("tutors.json").select(args.only, args.exclude, args.tag, shard)
+            return [Tutor(entry.name, entry.id) for entry in entries]
+
+        # Each request is its own run in the history, so checking a tutor again does not replace their last result
+        def start_request(request_number):
+            return run_history.start_run(f"{output_dir} request {request_number}", VERSION) if run_history else None
+
+        def record_tutor(request_run_id, tutor, result):
+            if result:
+                output(tutor.name, result)
+            records = results.write_tutor(tutor)
+            metrics.inc("tutors_done")
+            if run_history:
+                run_history.add_tutor(request_run_id, tutor.id, tutor.name, result, records)
+
+        def finish_request(request_run_id):
+            if run_history:
+                run_history.finish_run(request_run_id)
+
+        daemon.serve(args.port, args.workers, create_supervised_checker, check_tutor_supervised, load_tutors, start_request, record_tutor, finish_request)
+
+        shut_down(output_dir, args.parquet)
+        sys.exit()
+
+    if run_history:
+        run_id = run_history.start_run(output_dir, VERSION)
+
+    # Tutors finished so far are saved after each one, so the sweep can be resumed if it is interrupted
+    run_checkpoint = checkpoint.Checkpoint(output_dir)
+
+    # A resumed sweep checks the tutors it was started with, so resuming one machine's shard does not turn it into a sweep of the whole roster
+    selection = {"only": args.only, "exclude": args.exclude, "tags": args.tag, "shard": list(shard) if shard else None}
+    if resume_dir and run_checkpoint.selection is not None:
+        if any(selection.values()) and selection != run_checkpoint.selection:
+            log("Fatal error", f"The sweep in {output_dir} was started with a different --only, --exclude, --tag or --shard. Resume it without them to check the same tutors")
+            sys.exit()
+        selection = run_checkpoint.selection
+    run_checkpoint.selection = selection
+
+    tutor_roster = roster.load("tutors.json")
+    entries = tutor_roster.select(selection["only"], selection["exclude"], selection["tags"], selection["shard"])
+    if not entries:
+        log("Fatal error", "No tutors in tutors.json match the selection")
+        sys.exit()
+    if len(entries) < len(tutor_roster):
+        log("Status", f"Checking {len(entries)} of the {len(tutor_roster)} tutors in tutors.json")
+
+    # List of tutor classes to store data
+    tutors = [Tutor(entry.name, entry.id) for entry in entries]
+
+    run_checkpoint.partial = run_checkpoint.partial or len(entries) < len(tutor_roster)
+    remaining = []
+    for current_tutor in range(0, len(tutors)):
+        if run_checkpoint.is_done(tutors[current_tutor].id):
+            tutors[current_tutor].restore(run_checkpoint.records[str(tutors[current_tutor].id)]["tutor"])
+        else:
+            remaining.append(current_tutor)
+
+    if PRIORITY_ORDER:
+        remaining = schedule.order_tutors(tutors, remaining, run_history, submission_cache, {entry.id: entry.priority for entry in entries})
+    metrics.set_gauge("tutors_remaining", len(remaining))
+
+    # Writes a finished tutor's results and adds them to the run history, then saves the tutor to the checkpoint.
+    # If write_output is False, the output text is left to be written at the end, in file order
+    def finish_tutor(current_tutor, result, write_output):
+        if write_output and result:
+            output(tutors[current_tutor].name, result)
+        records = results.write_tutor(tutors[current_tutor])
+        if run_history:
+            run_history.add_tutor(run_id, tutors[current_tutor].id, tutors[current_tutor].name, result, records)
+        run_checkpoint.save(tutors[current_tutor], current_tutor, result, write_output)
+        metrics.inc("tutors_done")
+        metrics.inc("tutors_remaining", -1)
+
+    if resume_dir:
+        log("Status", f"Resuming sweep in {output_dir}: {len(tutors) - len(remaining)} tutors already checked, {len(remaining)} remaining")
+
+        # Write any results that were checked but not written before the sweep stopped
+        write_unwritten(run_checkpoint)
+
+    if args.coordinator:
+        # Results come back from the workers with the tutor's data and submission records
+        def collect_tutor(current_tutor, result, tutor_data, records):
+            tutors[current_tutor].restore(tutor_data)
+            results.extend(tutors[current_tutor], records)
+            finish_tutor(current_tutor, result, PRIORITY_ORDER)
+
+        work_queue = workqueue.WorkQueue(args.queue)
+        workqueue.run_coordinator(work_queue, os.path.basename(os.path.normpath(output_dir)), tutors, remaining, collect_tutor)
+        work_queue.close()
+    elif DATA_SOURCE == "async":
+        log("Status", f"Checking {len(remaining)} tutors with the async engine")
+        overdue = async_engine.run_sweep(CANVAS_URL, "token.txt", TIMEOUT, USE_HOURS, OVERDUE_LENGTH, args.concurrency, args.rate_limit, tutors, remaining,
+                                         lambda current_tutor, result: finish_tutor(current_tutor, result, PRIORITY_ORDER))
+
+        # Screenshot the overdue submissions with the browser, now the sweep is finished
+        if overdue:
+            Screenshotter = canvas_api.APIChecker(options_array, TIMEOUT, CANVAS_URL, USE_HOURS, OVERDUE_LENGTH)
+            Screenshotter.login("account.txt", session_store(1))
+            for current_tutor, assignment_url, student_id, number in overdue:
+                Screenshotter.screenshot_submission(assignment_url, student_id, tutors[current_tutor].name, number)
+            Screenshotter.quit()
+    elif args.workers == 1:
+        # Create chrome driver instance, and log in as admin user
+        Driver = create_supervised_checker()
+
+        # Loop through each user, writing results as we go
+        try:
+            for current_tutor in remaining:
+                # A bad tutor must not end the sweep. It is left unfinished, so --resume tries it again
+                try:
+                    result = check_tutor_supervised(Driver, tutors, current_tutor)
+                except Exception as e:
+                    log(tutors[current_tutor].name, f"Error checking tutor: {e}")
+                    tutors[current_tutor].reset()
+                    try:
+                        Driver.stop_acting_as_user()
+                    except Exception:
+                        pass
+                    continue
+
+                finish_tutor(current_tutor, result, True)
+        finally:
+            Driver.quit()
+    else:
+        log("Status", f"Checking {len(remaining)} tutors with {args.workers} workers")
+        pool.run_pool(args.workers, create_supervised_checker, check_tutor_supervised, tutors, remaining,
+                                lambda current_tutor, result: finish_tutor(current_tutor, result, PRIORITY_ORDER))
+
+    # Merge any results not written as they finished into the output file, in the same order as the tutors file
+    write_unwritten(run_checkpoint)
+
+    if all(run_checkpoint.is_done(tutor.id) for tutor in tutors):
+        run_checkpoint.finish()
+        if run_history:
+            run_history.finish_run(run_id)
+    else:
+        log("Warning", f"Not every tutor could be checked. Run again with --resume {output_dir} to retry them")
+
+    stats.write_summary(output_dir, tutors)
+    shut_down(output_dir, args.parquet)
@@ -0,0 +1,62 @@
+# Description: Parses the submission dates shown in SpeedGrader, and calculates the time since submission
+
+import functools
+import re
+
+# Custom modules
+from utils import *
+
+
+# Matches the date in a SpeedGrader date string, eg "Submitted:\n5 Mar at 14:32" or "12 Nov 2023 at 09:05". The year is left off dates in the current year
+SUBMISSION_DATE_PATTERN = re.compile(r"(\d{1,2}) ([A-Za-z]{3})[a-z]*,?(?: (\d{4}))?,?(?: at)? (\d{1,2}):(\d{2})")
+
+MONTHS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
+
+
+# Reads a SpeedGrader date string. Returns (datetime, None) if successful, or (None, reason) if not.
+# Results are cached, as the same string is read once per submission and dates repeat across a sweep
+@functools.lru_cache(maxsize=4096)
+def read_date_string(date_string, current_year):
+    # Check first for any anomalies in the date string
+    if "missing" in date_string:
+        return None, "Assignment is marked MISSING"
+    elif "no submission time" in date_string:
+        return None, "No submission time"
+
+    match = SUBMISSION_DATE_PATTERN.search(date_string)
+    if not match:
+        return None, "Unrecognised date"
+
+    day, month, year, hour, minute = match.groups()
+    try:
+        return datetime.datetime(int(year) if year else current_year, MONTHS[month.lower()], int(day), int(hour), int(minute)), None
+    except (KeyError, ValueError):
+        return None, "Invalid date"
+
+
+# Parses a canvas date string into a datetime. Returns None if the date string is invalid
+def parse_submission_date(date_string):
+    submitted, problem = read_date_string(date_string, datetime.datetime.now().year)
+
+    if problem in ("Assignment is marked MISSING", "No submission time"):
+        log("Warning", f"Could not calculate time since submission: {problem}")
+    elif problem:
+        log("Error", f"Could not parse submission date ({problem}). Date string: {date_string}")
+
+    return submitted
+
+
+# Converts a Canvas API timestamp (ISO 8601, always UTC) to a local datetime, to match the times shown in SpeedGrader
+def parse_canvas_timestamp(timestamp):
+    submitted = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return submitted.astimezone().replace(tzinfo=None)
+
+
+# Calculates hours and calendar days since a submission, given the submission time as a local datetime.
+# Both are calculated from the same time, so they always agree
+def time_since_submission(submitted, now=None):
+    if now is None:
+        now = datetime.datetime.now()
+    hours = (now - submitted).total_seconds() / 3600
+    days = (now.date() - submitted.date()).days
+    return hours, days
@@ -0,0 +1,244 @@
+# Description: A database of every sweep, each tutor's result in it, and every submission it checked, so past runs can be queried
+# without reading their output folders.
+# Usage: python history.py tutor "Tutor Name" [--days 90]
+#        python history.py slowest [--days 120] [--limit 20]
+#        python history.py runs [--limit 20]
+#        python history.py import output/2024-01-01_09-00 [...]
+
+import argparse
+import csv
+import json
+import sqlite3
+import threading
+
+# Custom modules
+from utils import *
+
+
+HISTORY_FILE = "history.db"
+
+
+class RunHistory:
+
+    # Opens (or creates) the history database
+    def __init__(self, filename=HISTORY_FILE):
+        # Workers share one connection, so access is serialised with a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+
+        # The history is only added to, so write ahead logging lets queries run while a sweep is writing
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                output_dir TEXT NOT NULL UNIQUE,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                version TEXT
+            );
+            CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+
+            CREATE TABLE IF NOT EXISTS tutor_runs (
+                run_id INTEGER NOT NULL REFERENCES runs (run_id),
+                tutor_id TEXT NOT NULL,
+                tutor_name TEXT NOT NULL,
+                result TEXT,
+                submissions INTEGER NOT NULL,
+                overdue INTEGER NOT NULL,
+                average_hours REAL,
+                checked_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, tutor_id)
+            );
+            CREATE INDEX IF NOT EXISTS tutor_runs_tutor_id ON tutor_runs (tutor_id, checked_at);
+            CREATE INDEX IF NOT EXISTS tutor_runs_tutor_name ON tutor_runs (tutor_name, checked_at);
+
+            CREATE TABLE IF NOT EXISTS submissions (
+                run_id INTEGER NOT NULL REFERENCES runs (run_id),
+                tutor_id TEXT NOT NULL,
+                assignment_url TEXT,
+                student TEXT,
+                submitted_at TEXT,
+                hours REAL NOT NULL,
+                days INTEGER NOT NULL,
+                overdue INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS submissions_run_tutor ON submissions (run_id, tutor_id);
+            CREATE INDEX IF NOT EXISTS submissions_assignment ON submissions (assignment_url, run_id);
+        """)
+        self.connection.commit()
+
+
+    # Adds a run, or returns the existing one if the output directory has been seen before (eg a resumed sweep). Returns the run ID
+    def start_run(self, output_dir, version, started_at=None):
+        started_at = started_at or datetime.datetime.now()
+        with self.lock:
+            self.connection.execute("INSERT OR IGNORE INTO runs (output_dir, started_at, version) VALUES (?, ?, ?)",
+                                    (output_dir, started_at.isoformat(timespec="seconds"), version))
+            self.connection.commit()
+            return self.connection.execute("SELECT run_id FROM runs WHERE output_dir = ?", (output_dir,)).fetchone()[0]
+
+
+    # Marks a run as finished
+    def finish_run(self, run_id):
+        with self.lock:
+            self.connection.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (datetime.datetime.now().isoformat(timespec="seconds"), run_id))
+            self.connection.commit()
+
+
+    # Saves a tutor's result in a run, with their submission records (as made by results.add). Replaces anything saved for the tutor in the run before.
+    # The tutor's counts are worked out from the records, unless given as (submissions, overdue, average hours)
+    def add_tutor(self, run_id, tutor_id, tutor_name, result, records, checked_at=None, counts=None):
+        checked_at = (checked_at or datetime.datetime.now()).isoformat(timespec="seconds")
+        if counts:
+            submissions, overdue, average_hours = counts
+        else:
+            submissions = len(records)
+            overdue = sum(1 for record in records if record["overdue"])
+            average_hours = sum(record["hours"] for record in records) / len(records) if records else None
+
+        with self.lock:
+            self.connection.execute("DELETE FROM submissions WHERE run_id = ? AND tutor_id = ?", (run_id, str(tutor_id)))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tutor_runs (run_id, tutor_id, tutor_name, result, submissions, overdue, average_hours, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, str(tutor_id), tutor_name, result, submissions, overdue, average_hours, checked_at)
+            )
+            self.connection.executemany(
+                "INSERT INTO submissions (run_id, tutor_id, assignment_url, student, submitted_at, hours, days, overdue) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, str(tutor_id), record["assignment"], record["student"], record["submitted_at"], record["hours"], record["days"], int(record["overdue"])) for record in records]
+            )
+            self.connection.commit()
+
+
+    # Returns (checked at, overdue, submissions, average hours) of a tutor (by name or ID) in each run of the last days days, oldest first
+    def tutor_history(self, tutor, days):
+        since = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec="seconds")
+        with self.lock:
+            return self.connection.execute(
+                "SELECT checked_at, overdue, submissions, average_hours FROM tutor_runs WHERE tutor_id = ? AND checked_at >= ? "
+                "UNION ALL "
+                "SELECT checked_at, overdue, submissions, average_hours FROM tutor_runs WHERE tutor_name = ? AND tutor_id != ? AND checked_at >= ? "
+                "ORDER BY checked_at",
+                (str(tutor), since, tutor, str(tutor), since)
+            ).fetchall()
+
+
+    # Returns the (overdue, submissions) of each tutor in the latest run they were checked in, by tutor ID
+    def latest_tutor_results(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT tutor_id, overdue, submissions FROM tutor_runs AS latest "
+                "WHERE checked_at = (SELECT MAX(checked_at) FROM tutor_runs WHERE tutor_id = latest.tutor_id)"
+            ).fetchall()
+        return {tutor_id: (overdue, submissions) for tutor_id, overdue, submissions in rows}
+
+
+    # Returns (assignment URL, longest hours waiting, submissions seen, runs seen in) of the assignments that waited longest to be marked
+    # in the runs of the last days days
+    def slowest_assignments(self, days, limit):
+        since = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec="seconds")
+        with self.lock:
+            return self.connection.execute(
+                "SELECT submissions.assignment_url, MAX(submissions.hours), COUNT(*), COUNT(DISTINCT submissions.run_id) "
+                "FROM runs JOIN submissions ON submissions.run_id = runs.run_id "
+                "WHERE runs.started_at >= ? AND submissions.assignment_url IS NOT NULL "
+                "GROUP BY submissions.assignment_url ORDER BY MAX(submissions.hours) DESC LIMIT ?",
+                (since, limit)
+            ).fetchall()
+
+
+    # Returns (output directory, started at, finished at, tutors, overdue) of the latest runs, newest first
+    def runs(self, limit):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT runs.output_dir, runs.started_at, runs.finished_at, COUNT(tutor_runs.tutor_id), COALESCE(SUM(tutor_runs.overdue), 0) "
+                "FROM runs LEFT JOIN tutor_runs ON tutor_runs.run_id = runs.run_id "
+                "GROUP BY runs.run_id ORDER BY runs.started_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+
+    # Adds a sweep's output directory from before the history was kept, from its checkpoint and results file
+    def import_run(self, output_dir):
+        checkpoint_path = os.path.join(output_dir, "checkpoint.json")
+        if not os.path.exists(checkpoint_path):
+            log("Error", f"Could not import {output_dir} - it has no checkpoint.json")
+            return
+
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+
+        records = []
+        if os.path.exists(os.path.join(output_dir, "results.jsonl")):
+            with open(os.path.join(output_dir, "results.jsonl")) as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        elif os.path.exists(os.path.join(output_dir, "results.csv")):
+            with open(os.path.join(output_dir, "results.csv"), newline="") as f:
+                records = [dict(record, hours=float(record["hours"]), days=int(record["days"]), overdue=record["overdue"] == "True") for record in csv.DictReader(f)]
+
+        tutor_records = {}
+        for record in records:
+            tutor_records.setdefault(str(record["tutor_id"]), []).append(record)
+
+        # Output directories are named after the time the sweep started, eg 2024-01-01_09-00 or 2024-01-01_09-00_2
+        try:
+            started_at = datetime.datetime.strptime(os.path.basename(os.path.normpath(output_dir))[:16], "%Y-%m-%d_%H-%M")
+        except ValueError:
+            started_at = datetime.datetime.fromtimestamp(os.path.getmtime(checkpoint_path))
+
+        run_id = self.start_run(output_dir, None, started_at)
+        for tutor_id, record in checkpoint["tutors"].items():
+            # Counts come from the checkpoint, as runs from before the results files were written only have them there
+            hours = record["tutor"]["hours_since_submission"]
+            counts = (len(hours), len(record["tutor"]["overdue_time_since_submission"]), sum(hours) / len(hours) if hours else None)
+            self.add_tutor(run_id, tutor_id, record["tutor"]["name"], record["result"], tutor_records.get(tutor_id, []), started_at, counts)
+        if checkpoint.get("complete"):
+            self.finish_run(run_id)
+
+        log("History", f"Imported {output_dir}: {len(checkpoint['tutors'])} tutors, {len(records)} submissions")
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Answers questions about previous runs from the history database
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Queries the history of previous sweeps")
+    parser.add_argument("--history-file", default=HISTORY_FILE, help=f"History database (default {HISTORY_FILE})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tutor_parser = subparsers.add_parser("tutor", help="A tutor's overdue count in each run")
+    tutor_parser.add_argument("tutor", help="Tutor name or ID")
+    tutor_parser.add_argument("--days", type=int, default=90, help="How many days back to look (default 90)")
+
+    slowest_parser = subparsers.add_parser("slowest", help="The assignments that waited longest to be marked")
+    slowest_parser.add_argument("--days", type=int, default=120, help="How many days back to look (default 120)")
+    slowest_parser.add_argument("--limit", type=int, default=20, help="How many assignments to show (default 20)")
+
+    runs_parser = subparsers.add_parser("runs", help="The latest runs")
+    runs_parser.add_argument("--limit", type=int, default=20, help="How many runs to show (default 20)")
+
+    import_parser = subparsers.add_parser("import", help="Add output directories from before the history was kept")
+    import_parser.add_argument("output_dirs", nargs="+", help="Output directories to import")
+
+    args = parser.parse_args()
+    run_history = RunHistory(args.history_file)
+
+    if args.command == "tutor":
+        for checked_at, overdue, submissions, average_hours in run_history.tutor_history(args.tutor, args.days):
+            print(f"{checked_at} - Assignments overdue: {overdue} of {submissions}" + (f", average {average_hours:.0f} hours" if average_hours is not None else ""))
+    elif args.command == "slowest":
+        for assignment_url, hours, submissions, runs in run_history.slowest_assignments(args.days, args.limit):
+            print(f"{hours:.0f} hours - {assignment_url} ({submissions} submissions over {runs} runs)")
+    elif args.command == "runs":
+        for output_dir, started_at, finished_at, tutors, overdue in run_history.runs(args.limit):
+            print(f"{started_at} - {output_dir}: {tutors} tutors, {overdue} overdue" + ("" if finished_at else " (unfinished)"))
+    elif args.command == "import":
+        for output_dir in args.output_dirs:
+            run_history.import_run(output_dir)
+
+    run_history.close()
@@ -0,0 +1,129 @@
+# Description: Serves live counters and latency histograms of a sweep in the OpenMetrics (Prometheus) text format, so its progress can be
+# watched and alerted on while it runs. Nothing is recorded until the server is started, so it costs a single check when turned off.
+# Scrape http://<host>:<port>/metrics
+
+import bisect
+import http.server
+import threading
+
+# Custom modules
+from utils import *
+
+
+PREFIX = "dashboardchecker_"
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60] # Upper bounds of the latency histogram buckets, in seconds
+
+HELP = {
+    "tutors_done": ("counter", "Tutors finished this run"),
+    "tutors_remaining": ("gauge", "Tutors still to be checked this run"),
+    "submissions_checked": ("counter", "Submissions read, from the page, the API or the cache"),
+    "overdue_found": ("counter", "Overdue submissions found"),
+    "timeouts": ("counter", "Waits for a page that timed out, by phase"),
+    "driver_restarts": ("counter", "Browser restarts by the supervisor"),
+    "phase_seconds": ("histogram", "How long each phase took, by phase"),
+}
+
+enabled = False
+metrics_lock = threading.Lock()
+counters = {} # (name, label items) -> value, for counters and gauges
+histograms = {} # phase -> [count in each bucket (not cumulative), sum, count]
+
+
+# Adds to a counter, eg inc("timeouts", phase="wait: dashboard")
+def inc(name, amount=1, **labels):
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        counters[key] = counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    if not enabled:
+        return
+    with metrics_lock:
+        counters[(name, tuple(sorted(labels.items())))] = value
+
+
+# Records how long a phase took. Called by timing.record for every timing
+def observe(phase, seconds):
+    if not enabled:
+        return
+    with metrics_lock:
+        histogram = histograms.get(phase)
+        if histogram is None:
+            histogram = histograms[phase] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+        histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f"{key}=\"{escape(value)}\"" for key, value in labels) + "}"
+
+
+# Returns every metric in the OpenMetrics text format
+def render():
+    with metrics_lock:
+        counter_values = sorted(counters.items())
+        histogram_values = sorted((phase, (list(buckets), total, count)) for phase, (buckets, total, count) in histograms.items())
+
+    lines = []
+    for name, (metric_type, description) in HELP.items():
+        lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+        lines.append(f"# HELP {PREFIX}{name} {description}")
+
+        if metric_type == "histogram":
+            for phase, (buckets, total, count) in histogram_values:
+                # OpenMetrics buckets are cumulative, with le as a float
+                cumulative = 0
+                for bound, bucket_count in zip([float(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], buckets):
+                    cumulative += bucket_count
+                    lines.append(f"{PREFIX}{name}_bucket{format_labels((('phase', phase), ('le', bound)))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{format_labels((('phase', phase),))} {total}")
+                lines.append(f"{PREFIX}{name}_count{format_labels((('phase', phase),))} {count}")
+            continue
+
+        suffix = "_total" if metric_type == "counter" else ""
+        for (counter_name, labels), value in counter_values:
+            if counter_name == name:
+                lines.append(f"{PREFIX}{name}{suffix}{format_labels(labels)} {value}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        content = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    # Scrapes are too frequent to log
+    def log_message(self, format, *args):
+        pass
+
+
+# Starts recording, and serves the metrics on the given port in a background thread
+def start(port):
+    global enabled
+    enabled = True
+
+    server = http.server.ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log("Metrics", f"Serving metrics on http://localhost:{port}/metrics")
+    return server
@@ -0,0 +1,69 @@
+# Description: Runs a sweep across a pool of Checker instances, each with its own chrome driver and login
+
+import queue
+import threading
+
+# Custom modules
+from utils import *
+
+
+# A single worker. Creates its own checker, then keeps taking tutors off the shared queue until it is empty
+def worker_loop(worker_number, create_checker, check_tutor, tutors, tutor_queue, results, on_result):
+    worker_name = f"Worker {worker_number}"
+
+    # Each worker needs its own driver and login, as the masquerade is tied to the browser session
+    try:
+        Driver = create_checker(worker_number)
+    except BaseException as e:
+        # Checker calls sys.exit() on fatal errors, which only ends this thread. The other workers pick up the remaining tutors
+        log(worker_name, f"Could not start checker, worker exiting: {e}")
+        return
+
+    try:
+        while True:
+            try:
+                current_tutor = tutor_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            # A bad tutor must not take the worker down with it
+            try:
+                results[current_tutor] = check_tutor(Driver, tutors, current_tutor)
+            except Exception as e:
+                log(tutors[current_tutor].name, f"Error checking tutor: {e}")
+                tutors[current_tutor].reset()
+                try:
+                    Driver.stop_acting_as_user()
+                except Exception:
+                    pass
+                continue
+
+            if on_result:
+                on_result(current_tutor, results[current_tutor])
+    finally:
+        Driver.quit()
+
+
+# Checks the tutors at the given positions using a pool of workers. create_checker(worker number) should return a logged in checker.
+# on_result(position, output text) is called from the worker as each tutor finishes.
+# Returns a list of output text for each tutor (None if the tutor was not checked), in the same order as tutors
+def run_pool(worker_count, create_checker, check_tutor, tutors, positions, on_result=None):
+    # Tutors are handed out one at a time, so a slow tutor only holds up the worker checking it
+    tutor_queue = queue.Queue()
+    for current_tutor in positions:
+        tutor_queue.put(current_tutor)
+
+    results = {}
+    workers = []
+    for i in range(0, worker_count):
+        worker = threading.Thread(target=worker_loop, args=(i + 1, create_checker, check_tutor, tutors, tutor_queue, results, on_result), daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    for worker in workers:
+        worker.join()
+
+    if not tutor_queue.empty():
+        log("Error", f"All workers exited before finishing, {tutor_queue.qsize()} tutors were not checked")
+
+    return [results.get(current_tutor) for current_tutor in range(0, len(tutors))]
@@ -0,0 +1,120 @@
+# Description: Writes one record per checked submission (tutor, assignment, student, submission time, hours, days, overdue) to a
+# JSONL or CSV file as the sweep runs, so reports can read the results without parsing output.txt. Optionally exports them to Parquet at the end
+
+import csv
+import json
+import threading
+
+# Optional - only needed for the Parquet export
+try:
+    import pyarrow.csv
+    import pyarrow.json
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Custom modules
+from utils import *
+
+
+# -- SETTINGS --
+RESULTS_FORMAT = "jsonl" # Format to write results in: jsonl, csv, or None to not write them
+FIELDS = ["tutor", "tutor_id", "assignment", "student", "submitted_at", "hours", "days", "overdue"]
+
+results_file = None
+csv_writer = None
+pending = {} # Records of tutors still being checked, by Tutor object, as the same tutor can be checked by two requests of the daemon at once.
+             # Written once the tutor is finished, in case the tutor is checked again
+results_lock = threading.Lock()
+
+
+# Opens the results file in the output directory, adding to it if the sweep is being resumed
+def configure(output_dir, format):
+    global RESULTS_FORMAT, results_file, csv_writer
+
+    RESULTS_FORMAT = format
+    if not format:
+        return
+
+    path = os.path.join(output_dir, f"results.{format}")
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    results_file = open(path, "a", newline="")
+
+    if format == "csv":
+        csv_writer = csv.DictWriter(results_file, fieldnames=FIELDS)
+        if is_new:
+            csv_writer.writeheader()
+
+
+# Adds a checked submission to the tutor's records. Records are kept even without a results file, for the run history
+def add(tutor, assignment_url, student, submitted, hours, days, overdue):
+    record = {
+        "tutor": tutor.name,
+        "tutor_id": tutor.id,
+        "assignment": assignment_url,
+        "student": student,
+        "submitted_at": submitted.isoformat() if submitted else None,
+        "hours": round(hours, 2),
+        "days": days,
+        "overdue": overdue,
+    }
+
+    with results_lock:
+        pending.setdefault(tutor, []).append(record)
+
+
+# Adds records made elsewhere, eg by a worker process, to a tutor's records
+def extend(tutor, records):
+    with results_lock:
+        pending.setdefault(tutor, []).extend(records)
+
+
+# Throws away the records of a tutor, eg when it is going to be checked again from the start
+def discard(tutor):
+    with results_lock:
+        pending.pop(tutor, None)
+
+
+# Writes the records of a finished tutor to the results file, if there is one. Returns the records
+def write_tutor(tutor):
+    with results_lock:
+        records = pending.pop(tutor, [])
+        if results_file is None:
+            return records
+
+        for record in records:
+            if csv_writer:
+                csv_writer.writerow(record)
+            else:
+                results_file.write(json.dumps(record) + "\n")
+        results_file.flush()
+
+    return records
+
+
+# Closes the results file. If parquet is True, also exports the results to results.parquet next to it
+def close(parquet=False):
+    global results_file, csv_writer
+
+    if results_file is None:
+        return
+
+    path = results_file.name
+    results_file.close()
+    results_file = None
+    csv_writer = None
+
+    if not parquet:
+        return
+    if pyarrow is None:
+        log("Warning", "pyarrow is not installed, so the results were not exported to Parquet. Install it with: pip install pyarrow")
+        return
+
+    try:
+        if RESULTS_FORMAT == "csv":
+            table = pyarrow.csv.read_csv(path)
+        else:
+            table = pyarrow.json.read_json(path)
+        pyarrow.parquet.write_table(table, os.path.splitext(path)[0] + ".parquet")
+    except Exception as e:
+        log("Error", f"Could not export results to Parquet: {e}")
@@ -0,0 +1,126 @@
+# Description: The roster of tutors from tutors.json, indexed by ID, name and tag, with selectors for targeted sweeps and for splitting a
+# sweep between machines. Each tutor in tutors.json is either just a name, or an object with optional metadata:
+#   "7863685": "Adam Lockey",
+#   "7867697": {"name": "Alibi Farren", "department": "Maths", "tags": ["gcse", "new"], "priority": 2}
+
+import zlib
+
+# Custom modules
+from utils import *
+
+
+# A tutor on the roster. Position is where the tutor is in tutors.json, so selections keep file order
+class RosterEntry:
+
+    __slots__ = ("id", "name", "department", "tags", "priority", "position")
+
+    def __init__(self, id, name, department=None, tags=(), priority=0, position=0):
+        self.id = id
+        self.name = name
+        self.department = department
+        self.tags = frozenset(tags)
+        self.priority = priority # Tutors with a higher priority are checked first
+        self.position = position
+
+
+class Roster:
+
+    def __init__(self, entries):
+        self.entries = entries # In file order
+        self.by_id = {}
+        self.by_name = {}
+        self.by_tag = {} # Tag -> positions of the tutors with it
+        for entry in entries:
+            self.by_id[entry.id] = entry
+            self.by_name.setdefault(entry.name, entry)
+            for tag in entry.tags:
+                self.by_tag.setdefault(tag, set()).add(entry.position)
+            if entry.department:
+                self.by_tag.setdefault(entry.department, set()).add(entry.position)
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    # Returns the tutor with the given ID, or failing that the given name, or None if there is no such tutor
+    def get(self, key):
+        key = str(key)
+        return self.by_id.get(key) or self.by_name.get(key)
+
+
+    # Returns the positions of the tutors with the given IDs or names. Logs a warning for any that are not on the roster
+    def positions_of(self, keys):
+        positions = set()
+        for key in keys:
+            entry = self.get(key)
+            if entry is None:
+                log("Warning", f"{key} is not in the roster")
+            else:
+                positions.add(entry.position)
+        return positions
+
+
+    # Returns the tutors to check, in file order. Only includes the given IDs or names if only is given, and tutors with any of the given
+    # tags (or departments) if tags is given, leaving out the excluded IDs or names. shard (i, n) then keeps the i'th of n shards (counting from 1)
+    def select(self, only=None, exclude=None, tags=None, shard=None):
+        positions = None
+        if only:
+            positions = self.positions_of(only)
+        if tags:
+            tagged = set().union(*(self.by_tag.get(tag, set()) for tag in tags))
+            positions = tagged if positions is None else positions & tagged
+        if positions is None:
+            positions = set(range(0, len(self.entries)))
+        if exclude:
+            positions -= self.positions_of(exclude)
+
+        entries = [self.entries[position] for position in sorted(positions)]
+        if shard:
+            entries = shard_entries(entries, *shard)
+        return entries
+
+
+# Returns the index'th of count shards (counting from 1) of the entries, in file order. The entries are sorted by a hash of their ID and dealt
+# out in turn, so the shards differ in size by at most one, and every machine with the same roster and selectors agrees without sharing anything
+def shard_entries(entries, index, count):
+    dealt = sorted(entries, key=lambda entry: (zlib.crc32(str(entry.id).encode()), entry.id))
+    return sorted(dealt[index - 1::count], key=lambda entry: entry.position)
+
+
+# Reads a shard like "2/4" into (2, 4)
+def parse_shard(text):
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        log("Fatal error", f"Shard must be like 2/4, not {text}")
+        sys.exit()
+    if count < 1 or not 1 <= index <= count:
+        log("Fatal error", f"Shard {text} does not exist, it must be between 1/{count} and {count}/{count}")
+        sys.exit()
+    return index, count
+
+
+# Loads the roster from a tutors file
+def load(filename):
+    userIDs, values = load_json(filename)
+
+    entries = []
+    for position in range(0, len(userIDs)):
+        value = values[position]
+        if isinstance(value, str):
+            entries.append(RosterEntry(userIDs[position], value, position=position))
+        elif isinstance(value, dict) and value.get("name"):
+            # A single tag can be given as a string, which would otherwise be read as a tag per letter
+            tags = value.get("tags", [])
+            if isinstance(tags, str):
+                tags = [tags]
+            if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+                log("Fatal error", f"The tags of tutor {userIDs[position]} in {filename} must be a list of strings")
+                sys.exit()
+            entries.append(RosterEntry(userIDs[position], value["name"], value.get("department"), tags, value.get("priority", 0), position))
+        else:
+            log("Fatal error", f"Tutor {userIDs[position]} in {filename} must be a name, or an object with a name")
+            sys.exit()
+
+    return Roster(entries)
@@ -0,0 +1,42 @@
+# Description: Orders a sweep so the tutors (and assignments) most likely to be overdue are checked first, using the previous run's overdue
+# counts and the oldest submission times in the cache. If a sweep is cut short, the worst cases have already been written
+
+# Custom modules
+from utils import *
+
+
+# Returns the positions of the tutors to check, most likely to be overdue first. Tutors with a higher priority on the roster go first, then
+# it uses each tutor's overdue count from the latest run in the history (tutors with no history are expected to have the average), then the
+# age of their oldest cached submission, then their submission count
+def order_tutors(tutors, positions, run_history=None, submission_cache=None, priorities=None):
+    latest = run_history.latest_tutor_results() if run_history else {}
+    oldest = submission_cache.oldest_by_tutor() if submission_cache else {}
+    priorities = priorities or {}
+    if not latest and not oldest and not any(priorities.values()):
+        log("Schedule", "No previous runs to order tutors by, checking them in file order")
+        return positions
+
+    average_overdue = sum(overdue for overdue, submissions in latest.values()) / len(latest) if latest else 0
+    now = datetime.datetime.now()
+
+    def priority(current_tutor):
+        tutor_id = str(tutors[current_tutor].id)
+        overdue, submissions = latest.get(tutor_id, (average_overdue, 0))
+        oldest_age = (now - oldest[tutor_id]).total_seconds() if tutor_id in oldest else 0
+        return (priorities.get(tutor_id, 0), overdue, oldest_age, submissions)
+
+    # Sorting is stable, so tutors with the same priority stay in file order
+    ordered = sorted(positions, key=priority, reverse=True)
+    log("Schedule", f"Checking tutors in priority order, starting with {', '.join(tutors[current_tutor].name for current_tutor in ordered[:3])}")
+    return ordered
+
+
+# Returns a tutor's dashboard assignments (and their badge counts) ordered with the oldest cached submission first, then the most submissions
+def order_assignments(tutor_id, assignment_urls, submission_count, submission_cache=None):
+    oldest = submission_cache.oldest_by_assignment(tutor_id) if submission_cache else {}
+    now = datetime.datetime.now()
+
+    assignments = sorted(zip(assignment_urls, submission_count),
+                         key=lambda assignment: ((now - oldest[assignment[0]]).total_seconds() if assignment[0] in oldest else 0, assignment[1]),
+                         reverse=True)
+    return [url for url, count in assignments], [count for url, count in assignments]
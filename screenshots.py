@@ -0,0 +1,127 @@
+# Description: Takes screenshots of overdue submissions. The browser only captures the raw image, which is then cropped,
+# compressed and written to disk on a background thread so the driver can move on to the next page straight away
+
+import io
+import queue
+import threading
+
+# Optional - needed to compress and crop screenshots. Without it, screenshots are saved as full size PNGs
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Custom modules
+import utils
+from utils import log
+
+
+# -- SETTINGS --
+SCREENSHOT_FORMAT = "webp" # Format to save screenshots in: webp, jpeg or png
+SCREENSHOT_QUALITY = 60 # Quality for webp and jpeg screenshots, 1-100
+CROP_SELECTOR = "#right_side" # Screenshots are cropped to this element (the SpeedGrader submission panel). None to keep the whole page
+QUEUE_SIZE = 32 # How many screenshots can wait to be written before the driver has to wait too
+
+screenshot_queue = None
+writer_thread = None
+writer_lock = threading.Lock()
+
+
+# Changes the screenshot settings. Falls back to uncropped PNGs if Pillow is not installed
+def configure(format, quality, crop):
+    global SCREENSHOT_FORMAT, SCREENSHOT_QUALITY, CROP_SELECTOR
+
+    if Image is None and (format != "png" or crop):
+        log("Warning", "Pillow is not installed, so screenshots will be saved as full size PNGs. Install it with: pip install pillow")
+        format, crop = "png", None
+
+    SCREENSHOT_FORMAT = format
+    SCREENSHOT_QUALITY = quality
+    CROP_SELECTOR = crop
+
+
+# Crops, compresses and writes a screenshot to disk
+def write_screenshot(png, filename, crop_box):
+    if Image is None or (SCREENSHOT_FORMAT == "png" and crop_box is None):
+        # Nothing to do to the image, so write it as it is
+        with open(filename, "wb") as f:
+            f.write(png)
+        return
+
+    image = Image.open(io.BytesIO(png))
+    if crop_box:
+        image = image.crop(crop_box)
+
+    if SCREENSHOT_FORMAT == "jpeg":
+        image.convert("RGB").save(filename, "JPEG", quality=SCREENSHOT_QUALITY, optimize=True)
+    elif SCREENSHOT_FORMAT == "webp":
+        image.save(filename, "WEBP", quality=SCREENSHOT_QUALITY, method=4)
+    else:
+        image.save(filename, "PNG", optimize=True)
+
+
+# Background thread. Writes screenshots from the queue until it is given None
+def writer_loop():
+    while True:
+        item = screenshot_queue.get()
+        if item is None:
+            break
+
+        try:
+            write_screenshot(*item)
+        except Exception as e:
+            log("Error", f"Could not save screenshot {item[1]}: {e}")
+
+
+# Returns the area of the page to crop to, in screenshot pixels, or None if the page should not be cropped
+def get_crop_box(driver):
+    if not CROP_SELECTOR or Image is None:
+        return None
+
+    rect = driver.execute_script("""
+        var element = document.querySelector(arguments[0]);
+        if (!element) return null;
+        var r = element.getBoundingClientRect();
+        return [r.left, r.top, r.right, r.bottom, window.devicePixelRatio || 1];
+    """, CROP_SELECTOR)
+    if not rect:
+        return None
+
+    left, top, right, bottom, scale = rect
+    if right <= left or bottom <= top:
+        return None
+    return (int(left * scale), int(top * scale), int(right * scale), int(bottom * scale))
+
+
+# Takes a screenshot of the active page, naming after the name of the tutor, and assignment number
+def screenshot(driver, name, number):
+    global screenshot_queue, writer_thread
+
+    if not driver:
+        log("Error", "Could not take screenshot, driver not initialized")
+        return
+
+    # Start the writer the first time it is needed
+    with writer_lock:
+        if writer_thread is None:
+            screenshot_queue = queue.Queue(maxsize=QUEUE_SIZE)
+            writer_thread = threading.Thread(target=writer_loop, daemon=True)
+            writer_thread.start()
+
+    format = SCREENSHOT_FORMAT if Image is not None else "png"
+    extension = "jpg" if format == "jpeg" else format
+    filename = f"{utils.output_dir}/overdue/{name}{number}.{extension}"
+
+    crop_box = get_crop_box(driver.driver)
+    screenshot_queue.put((driver.driver.get_screenshot_as_png(), filename, crop_box))
+
+
+# Waits for every queued screenshot to be written, then stops the writer
+def close():
+    global writer_thread
+
+    with writer_lock:
+        if writer_thread is not None:
+            screenshot_queue.put(None)
+            writer_thread.join()
+            writer_thread = None
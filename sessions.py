@@ -0,0 +1,41 @@
+# Description: Saves the cookies of a logged in browser, so later runs (and restarted browsers) can skip the login form
+
+import json
+
+# Custom modules
+from utils import *
+
+
+SESSION_DIR = "sessions"
+
+
+class SessionStore:
+
+    # Each checker needs its own session, as canvas stores who we are acting as in the session. Sharing one would mix up the checkers,
+    # so the name must be unique to a checker of a process, eg worker-1 for the first worker of a sweep
+    def __init__(self, name, session_dir=SESSION_DIR):
+        self.path = os.path.join(session_dir, f"{name}.json")
+
+
+    # Returns the saved (user ID, cookies), or (None, None) if there is no saved session
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data["user_id"], data["cookies"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None, None
+
+
+    # Saves the cookies of a logged in session. The file is only readable by us, as anyone with the cookies is logged in as the admin
+    def save(self, user_id, cookies):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w") as f:
+            json.dump({"user_id": user_id, "cookies": cookies, "saved_at": datetime.datetime.now().isoformat()}, f)
+
+
+    # Removes the saved session, eg once it has expired
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
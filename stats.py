@@ -0,0 +1,241 @@
+# Description: Statistics over tutor results - percentiles and histograms of time since submission, rollups by department, and
+# trends in overdue marking across runs, read from the results files each sweep writes.
+# Usage: python stats.py [--runs 30] [--tutors tutors.json] [--buckets 0,1,2,3,5,7,14]
+
+import argparse
+import bisect
+import collections
+import csv
+import json
+
+# Optional - makes aggregation over many runs much faster. Without it, the same statistics are worked out in plain python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Custom modules
+import checkpoint
+import roster
+from utils import *
+
+
+# -- SETTINGS --
+DAY_BUCKETS = list(range(0, 12)) # Upper bounds of the calendar day buckets, in days. One more bucket holds everything past the last, eg 12+
+PERCENTILES = [50, 90, 95] # Percentiles of hours since submission to report
+UNASSIGNED = "Unassigned" # Department of tutors with no department in the tutors file
+
+
+# Changes the calendar day buckets. Must be set before any tutors are created, as each tutor keeps a count per bucket
+def configure(day_buckets):
+    global DAY_BUCKETS
+    DAY_BUCKETS = sorted(day_buckets)
+
+
+# Returns the index of the calendar day bucket a submission falls in
+def day_bucket(days):
+    return bisect.bisect_left(DAY_BUCKETS, days)
+
+
+# Returns a label for each calendar day bucket, eg "3" or "8-14", then "15+"
+def bucket_labels(buckets=None):
+    buckets = buckets if buckets is not None else DAY_BUCKETS
+    labels = []
+    lower = 0
+    for upper in buckets:
+        labels.append(str(upper) if upper == lower else f"{lower}-{upper}")
+        lower = upper + 1
+    labels.append(f"{lower}+")
+    return labels
+
+
+# Returns the given percentiles of a list of values, interpolating between the closest values. None for each if there are no values
+def percentiles(values, ps=PERCENTILES):
+    if len(values) == 0:
+        return [None] * len(ps)
+
+    if numpy is not None:
+        return [float(value) for value in numpy.percentile(numpy.asarray(values, dtype=float), ps)]
+
+    values = sorted(values)
+    result = []
+    for p in ps:
+        rank = p / 100 * (len(values) - 1)
+        lower = int(rank)
+        upper = min(lower + 1, len(values) - 1)
+        result.append(values[lower] + (values[upper] - values[lower]) * (rank - lower))
+    return result
+
+
+# Returns how many of the values fall in each bucket, with one more bucket for values past the last
+def histogram(values, buckets=None):
+    buckets = buckets if buckets is not None else DAY_BUCKETS
+
+    if numpy is not None:
+        return numpy.bincount(numpy.searchsorted(buckets, numpy.asarray(values, dtype=float), side="left"), minlength=len(buckets) + 1).tolist()
+
+    counts = [0] * (len(buckets) + 1)
+    for value in values:
+        counts[bisect.bisect_left(buckets, value)] += 1
+    return counts
+
+
+# Returns the statistics of a single tutor's checked submissions
+def summarise_tutor(tutor):
+    hours = tutor.hours_since_submission
+    return {
+        "id": tutor.id,
+        "submissions": len(hours),
+        "overdue": tutor.get_overdue(),
+        "average_hours": tutor.get_average_hours() if len(hours) else None,
+        "hours_percentiles": dict(zip([f"p{p}" for p in PERCENTILES], [round(value, 1) if value is not None else None for value in percentiles(hours)])),
+        "days_histogram": dict(zip(bucket_labels(), tutor.calendar_days_since_submission)),
+    }
+
+
+# Writes the statistics of each tutor, and of every tutor together, to stats.json in the output directory
+def write_summary(output_dir, tutors):
+    all_hours = [hours for tutor in tutors for hours in tutor.hours_since_submission]
+    days_histogram = [sum(counts) for counts in zip(*(tutor.calendar_days_since_submission for tutor in tutors))]
+
+    summary = {
+        "overall": {
+            "submissions": len(all_hours),
+            "overdue": sum(tutor.get_overdue() for tutor in tutors),
+            "hours_percentiles": dict(zip([f"p{p}" for p in PERCENTILES], [round(value, 1) if value is not None else None for value in percentiles(all_hours)])),
+            "days_histogram": dict(zip(bucket_labels(), days_histogram)),
+        },
+        "tutors": {tutor.name: summarise_tutor(tutor) for tutor in tutors},
+    }
+
+    with open(os.path.join(output_dir, "stats.json"), "w") as f:
+        json.dump(summary, f, indent=4)
+
+
+# Loads the results file of a run into columns - lists of tutor names and IDs, and arrays of hours, days and whether each was overdue.
+# Returns None if the run has no results file
+def load_results(run_dir):
+    tutor_names, tutor_ids, hours, days, overdue = [], [], [], [], []
+
+    if os.path.exists(os.path.join(run_dir, "results.jsonl")):
+        with open(os.path.join(run_dir, "results.jsonl")) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    elif os.path.exists(os.path.join(run_dir, "results.csv")):
+        with open(os.path.join(run_dir, "results.csv"), newline="") as f:
+            records = list(csv.DictReader(f))
+        for record in records:
+            record["overdue"] = record["overdue"] == "True"
+    else:
+        return None
+
+    for record in records:
+        tutor_names.append(record["tutor"])
+        tutor_ids.append(str(record["tutor_id"]))
+        hours.append(float(record["hours"]))
+        days.append(int(record["days"]))
+        overdue.append(bool(record["overdue"]))
+
+    if numpy is not None:
+        hours, days, overdue = numpy.asarray(hours, dtype=float), numpy.asarray(days, dtype=int), numpy.asarray(overdue, dtype=bool)
+
+    return {"tutor": tutor_names, "tutor_id": tutor_ids, "hours": hours, "days": days, "overdue": overdue}
+
+
+# Returns the number of overdue submissions of each tutor in a run's columns, by tutor name
+def overdue_by_tutor(columns):
+    if numpy is not None and len(columns["tutor"]):
+        names, index = numpy.unique(numpy.asarray(columns["tutor"]), return_inverse=True)
+        counts = numpy.bincount(index, weights=columns["overdue"], minlength=len(names))
+        return {str(name): int(count) for name, count in zip(names, counts)}
+
+    counts = collections.Counter()
+    for name, overdue in zip(columns["tutor"], columns["overdue"]):
+        counts[name] += int(overdue)
+    return dict(counts)
+
+
+# Returns the submissions, overdue count, percentiles of hours and histogram of days of each department in a run's columns.
+# departments maps tutor names or IDs to department names
+def rollup(columns, departments):
+    tutor_departments = [departments.get(tutor_id, departments.get(name, UNASSIGNED)) for name, tutor_id in zip(columns["tutor"], columns["tutor_id"])]
+
+    result = {}
+    for department in sorted(set(tutor_departments)):
+        if numpy is not None:
+            mask = numpy.asarray(tutor_departments) == department
+            hours, days, overdue = columns["hours"][mask], columns["days"][mask], int(columns["overdue"][mask].sum())
+        else:
+            rows = [i for i, tutor_department in enumerate(tutor_departments) if tutor_department == department]
+            hours = [columns["hours"][i] for i in rows]
+            days = [columns["days"][i] for i in rows]
+            overdue = sum(columns["overdue"][i] for i in rows)
+
+        result[department] = {
+            "tutors": len({name for name, tutor_department in zip(columns["tutor"], tutor_departments) if tutor_department == department}),
+            "submissions": len(hours),
+            "overdue": overdue,
+            "hours_percentiles": dict(zip([f"p{p}" for p in PERCENTILES], percentiles(hours))),
+            "days_histogram": dict(zip(bucket_labels(), histogram(days))),
+        }
+
+    return result
+
+
+# Returns the run directories in the output directory of finished sweeps with a results file, oldest first. Interrupted sweeps, and
+# directories of workers, the daemon or runs that stopped early, are left out, as their results only cover some of the tutors
+def find_runs(output_root="output"):
+    if not os.path.isdir(output_root):
+        return []
+
+    runs = []
+    for run_dir in sorted(os.listdir(output_root)):
+        if not checkpoint.is_complete_run(os.path.join(output_root, run_dir)):
+            continue
+        if os.path.exists(os.path.join(output_root, run_dir, "results.jsonl")) or os.path.exists(os.path.join(output_root, run_dir, "results.csv")):
+            runs.append(os.path.join(output_root, run_dir))
+    return runs
+
+
+# Returns the overdue count of each tutor in each run, by tutor name, as a list in the same order as run_dirs.
+# Tutors with nothing to mark in a run have no results in it, so they count as 0
+def trends(run_dirs):
+    runs = [overdue_by_tutor(load_results(run_dir)) for run_dir in run_dirs]
+    tutor_names = sorted({name for run in runs for name in run})
+    return {name: [run.get(name, 0) for run in runs] for name in tutor_names}
+
+
+# Logs the department rollup of the latest run, and how each tutor's overdue count has changed over the runs
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Statistics and trends over the results of previous sweeps")
+    parser.add_argument("--output-root", default="output", help="Directory the sweeps were written to (default output)")
+    parser.add_argument("--runs", type=int, default=30, help="How many of the latest runs to compare (default 30)")
+    parser.add_argument("--tutors", default="tutors.json", help="Tutors file to read each tutor's department from, to roll up the results by (default tutors.json)")
+    parser.add_argument("--buckets", help="Upper bounds of the calendar day buckets, eg 0,1,2,3,5,7,14 (default 0-11, then 12+)")
+    args = parser.parse_args()
+
+    if args.buckets:
+        configure([int(bucket) for bucket in args.buckets.split(",")])
+
+    # Departments come from the roster, so they are only set in one place
+    departments = {}
+    if os.path.exists(args.tutors):
+        departments = {entry.id: entry.department for entry in roster.load(args.tutors).entries if entry.department}
+
+    run_dirs = find_runs(args.output_root)[-args.runs:]
+    if not run_dirs:
+        print(f"No runs with results found in {args.output_root}")
+        sys.exit()
+
+    print(f"Latest run: {run_dirs[-1]}")
+    for department, summary in rollup(load_results(run_dirs[-1]), departments).items():
+        p = summary["hours_percentiles"]
+        print(f"{department} - {summary['tutors']} tutors, {summary['submissions']} submissions, {summary['overdue']} overdue, "
+              f"hours p50 {p['p50'] or 0:.0f}, p90 {p['p90'] or 0:.0f}")
+        print("    Days: " + ", ".join(f"{label}: {count}" for label, count in summary["days_histogram"].items()))
+
+    if len(run_dirs) > 1:
+        print(f"\nOverdue over the last {len(run_dirs)} runs (first -> latest, change):")
+        tutor_trends = trends(run_dirs)
+        for name, counts in sorted(tutor_trends.items(), key=lambda item: item[1][-1] - item[1][0], reverse=True):
+            print(f"{name} - {counts[0]} -> {counts[-1]} ({counts[-1] - counts[0]:+d})")
@@ -0,0 +1,132 @@
+# Description: A local stub of the Canvas API endpoints used by the checker, so that it can be run and tested offline.
+# Usage: python stub_canvas.py [--port 8000] [--data stub_data.json], then run the checker with --source api --canvas-url http://localhost:8000
+
+import argparse
+import datetime
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+
+# Generates a random to-do list and set of submissions for each tutor, using a fixed seed so every run serves the same data
+def generate_data(tutor_ids, seed=0):
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    data = {"todo": {}, "submissions": {}}
+    assignment_id = 1
+
+    for tutor_id in tutor_ids:
+        course_id = rng.randint(100, 999)
+        todo = []
+        for i in range(0, rng.randint(0, 4)):
+            submissions = []
+            for student in range(0, rng.randint(1, 5)):
+                submitted = now - datetime.timedelta(hours=rng.uniform(1, 24 * 14))
+                submissions.append({
+                    "user_id": rng.randint(10000, 99999),
+                    "workflow_state": "submitted",
+                    "submitted_at": submitted.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                })
+
+            todo.append({
+                "type": "grading",
+                "needs_grading_count": len(submissions),
+                "html_url": f"/courses/{course_id}/gradebook/speed_grader?assignment_id={assignment_id}",
+            })
+            data["submissions"][f"{course_id}/{assignment_id}"] = submissions
+            assignment_id += 1
+
+        data["todo"][str(tutor_id)] = todo
+
+    return data
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    data = None
+    latency = 0
+    protocol_version = "HTTP/1.1" # Keep connections alive, as canvas does
+
+    def do_GET(self):
+        time.sleep(self.latency)
+
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+
+        if url.path == "/api/v1/users/self/todo":
+            items = self.data["todo"].get(params.get("as_user_id", [""])[0])
+            if items is None:
+                return self.send_json(401, {"errors": [{"message": "Invalid as_user_id"}]})
+            # Make the URLs absolute, as canvas does
+            items = [dict(item, html_url=f"http://{self.headers['Host']}{item['html_url']}") for item in items]
+            return self.send_page(items, url, params)
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/assignments/(\d+)/submissions", url.path)
+        if match:
+            return self.send_page(self.data["submissions"].get(f"{match.group(1)}/{match.group(2)}", []), url, params)
+
+        self.send_json(404, {"errors": [{"message": "The specified resource does not exist."}]})
+
+
+    # Sends one page of a list, with a Link header pointing at the next page if there is one
+    def send_page(self, items, url, params):
+        per_page = int(params.get("per_page", ["10"])[0])
+        page = int(params.get("page", ["1"])[0])
+
+        headers = {}
+        if page * per_page < len(items):
+            params = dict(params, page=[str(page + 1)])
+            next_url = f"http://{self.headers['Host']}{url.path}?{urllib.parse.urlencode(params, doseq=True)}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        self.send_json(200, items[(page - 1) * per_page:page * per_page], headers)
+
+
+    def send_json(self, status, body, headers={}):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+    # Only log errors, the checker makes a lot of requests
+    def log_message(self, format, *args):
+        pass
+
+
+# Creates a stub server for the given data. Port 0 picks a free port, which can be read from server.server_port
+def make_server(data, port=0, latency=0):
+    handler = type("Handler", (StubHandler,), {"data": data, "latency": latency})
+    return http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+# Starts the stub server in a background thread. Returns the server, call shutdown() on it to stop
+def start(data, port=0, latency=0):
+    server = make_server(data, port, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves a stub of the Canvas API for offline testing")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data", help="JSON file of to-do items and submissions to serve. If not given, random data is generated for each tutor in tutors.json")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds to wait before answering each request")
+    args = parser.parse_args()
+
+    if args.data:
+        with open(args.data) as f:
+            data = json.load(f)
+    else:
+        with open("tutors.json") as f:
+            data = generate_data(json.load(f).keys())
+
+    print(f"Serving stub Canvas API on http://localhost:{args.port}")
+    make_server(data, args.port, args.latency).serve_forever()
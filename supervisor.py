@@ -0,0 +1,130 @@
+# Description: Watches a checker over a long sweep. Restarts the browser (and logs in again) every few tutors, when it uses too
+# much memory, or when it stops responding, and retries the tutor that was being checked if the browser died part way through
+
+from selenium.common.exceptions import WebDriverException
+
+# Optional - used to measure browser memory. Without it, memory is read from /proc, which only works on Linux
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Custom modules
+import metrics
+from utils import *
+
+
+# Returns the resident memory of a process and all of its children in MB, or None if it cannot be measured
+def process_tree_memory(pid):
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [process] + process.children(recursive=True)) / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    # Build a map of parent to child processes, then add up the memory of everything under pid
+    children = {}
+    memory = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        children.setdefault(int(status["PPid"]), []).append(int(entry))
+        memory[int(entry)] = int(status.get("VmRSS", "0 kB").split()[0]) # In kB
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += memory.get(current, 0)
+        pending += children.get(current, [])
+
+    return total / 1024
+
+
+class SupervisedChecker:
+
+    # Starts a checker using create_checker, which should return a logged in checker
+    def __init__(self, create_checker, recycle_every, max_memory, retries=1):
+        self.create_checker = create_checker
+        self.RECYCLE_EVERY = recycle_every # Restart the browser after this many tutors. 0 to never restart on a schedule
+        self.MAX_MEMORY = max_memory # Restart the browser when it uses more than this many MB. 0 for no limit
+        self.RETRIES = retries # How many times to retry a tutor if the browser dies while checking it
+
+        self.Driver = None
+        self.tutors_since_start = 0
+        self.restarts = 0
+        self.start()
+
+
+    def start(self):
+        self.Driver = self.create_checker()
+        self.tutors_since_start = 0
+
+
+    # Closes the current browser, even if it is no longer responding, and starts a new one
+    def restart(self, reason):
+        log("Supervisor", f"Restarting browser: {reason}")
+        try:
+            self.Driver.quit()
+        except Exception:
+            pass
+
+        self.restarts += 1
+        metrics.inc("driver_restarts")
+        self.start()
+
+
+    # Returns the reason the browser should be restarted before the next tutor, or None if it is fine
+    def needs_restart(self):
+        if not self.Driver.is_alive():
+            return "browser is not responding"
+
+        if self.RECYCLE_EVERY and self.tutors_since_start >= self.RECYCLE_EVERY:
+            return f"checked {self.tutors_since_start} tutors"
+
+        if self.MAX_MEMORY:
+            pid = self.Driver.browser_pid()
+            memory = process_tree_memory(pid) if pid else None
+            if memory and memory > self.MAX_MEMORY:
+                return f"using {memory:.0f}MB of memory"
+
+        return None
+
+
+    # Checks a tutor with check_tutor(Driver, tutors, current_tutor), restarting the browser first if needed.
+    # If the browser dies part way through, the tutor's results so far are thrown away and the tutor is checked again
+    def check(self, check_tutor, tutors, current_tutor):
+        reason = self.needs_restart()
+        if reason:
+            self.restart(reason)
+
+        for attempt in range(0, self.RETRIES + 1):
+            try:
+                result = check_tutor(self.Driver, tutors, current_tutor)
+                self.tutors_since_start += 1
+                return result
+            except WebDriverException as e:
+                if attempt == self.RETRIES or self.Driver.is_alive():
+                    # Either out of retries, or the error was not caused by the browser dying
+                    raise
+
+                log(tutors[current_tutor].name, f"Browser died while checking tutor, retrying: {e.msg}")
+                tutors[current_tutor].reset()
+                self.restart("browser died")
+
+
+    def stop_acting_as_user(self):
+        self.Driver.stop_acting_as_user()
+
+
+    def quit(self):
+        self.Driver.quit()
@@ -0,0 +1,112 @@
+# Description: Records how long each phase of a sweep takes, per tutor, and writes a profile report of the run
+
+import collections
+import contextlib
+import json
+import math
+import threading
+import time
+
+# Custom modules
+import metrics
+from utils import *
+
+
+# Upper bounds of the histogram buckets in the report, in seconds
+HISTOGRAM_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60]
+
+MAX_TIMINGS = 200000 # Most timings kept for the report. Past this, the oldest are dropped, so a long running daemon does not keep growing
+
+# The timings recorded this run, as (tutor name, phase, seconds). Shared between workers
+timings = collections.deque(maxlen=MAX_TIMINGS)
+timings_lock = threading.Lock()
+
+# The tutor each worker thread is currently checking
+current = threading.local()
+
+
+# Sets the tutor that following timings on this thread belong to. None for timings outside of a tutor, eg logging in
+def set_tutor(tutor_name):
+    current.tutor = tutor_name
+
+
+# Records how long a phase took, against the given tutor, or the current tutor of this thread if not given
+def record(phase, seconds, tutor_name=None):
+    if tutor_name is None:
+        tutor_name = getattr(current, "tutor", None)
+
+    with timings_lock:
+        timings.append((tutor_name, phase, seconds))
+    metrics.observe(phase, seconds)
+
+
+# Times the code inside the with block as the given phase
+@contextlib.contextmanager
+def timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+# Returns the p'th percentile of a sorted list, using the nearest rank
+def percentile(sorted_values, p):
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+# Returns the count, total, p50, p95, max and a histogram of a list of timings
+def summarise(values):
+    values = sorted(values)
+
+    histogram = {}
+    for bucket in HISTOGRAM_BUCKETS:
+        histogram[f"<={bucket}s"] = 0
+    histogram[f">{HISTOGRAM_BUCKETS[-1]}s"] = 0
+    for value in values:
+        for bucket in HISTOGRAM_BUCKETS:
+            if value <= bucket:
+                histogram[f"<={bucket}s"] += 1
+                break
+        else:
+            histogram[f">{HISTOGRAM_BUCKETS[-1]}s"] += 1
+
+    return {
+        "count": len(values),
+        "total": round(sum(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(values[-1], 3),
+        "histogram": histogram,
+    }
+
+
+# Groups the timings recorded so far by phase, and by tutor then phase
+def build_report():
+    with timings_lock:
+        recorded = list(timings)
+
+    phases = {}
+    tutors = {}
+    for tutor_name, phase, seconds in recorded:
+        phases.setdefault(phase, []).append(seconds)
+        if tutor_name is not None:
+            tutors.setdefault(tutor_name, {}).setdefault(phase, []).append(seconds)
+
+    return {
+        "phases": {phase: summarise(values) for phase, values in sorted(phases.items())},
+        "tutors": {tutor_name: {phase: summarise(values) for phase, values in sorted(tutor_phases.items())} for tutor_name, tutor_phases in tutors.items()},
+    }
+
+
+# Writes the profile report to profile.json in the output directory, and logs a summary of each phase
+def write_report(output_dir):
+    report = build_report()
+
+    with open(os.path.join(output_dir, "profile.json"), "w") as f:
+        json.dump(report, f, indent=4)
+
+    if len(timings) == MAX_TIMINGS:
+        log("Timing", f"Only the latest {MAX_TIMINGS} timings are included in the report")
+    for phase, summary in report["phases"].items():
+        log("Timing", f"{phase}: {summary['count']} times, {summary['total']:.1f}s total, p50 {summary['p50']:.2f}s, p95 {summary['p95']:.2f}s, max {summary['max']:.2f}s")
@@ -1,35 +1,40 @@
-# Description: Contains utility functions for logging, outputting messages, and taking screenshots
+# Description: Contains utility functions for logging, outputting messages, and loading files
 
 import datetime
 import json
 import os
-import shutil
 import sys
+import threading
 
 # Global variables
 dashboard_log = None
 output_log = None
 output_dir = None
+write_lock = threading.Lock() # Workers share the log files, so writes must not interleave
 
 
-# Creates output directories
-def configure_outputs():
+# Creates output directories. If resume_dir is given, carries on using that directory instead of creating a new one
+def configure_outputs(resume_dir=None):
     global dashboard_log, output_log, output_dir
 
     try:
-        # Get current date, hour, and minute
-        current_datetime = datetime.datetime.now()
-        date_str = current_datetime.strftime("%Y-%m-%d_%H-%M")
-
-        # Create output directory with date and time stamp
-        output_dir = os.path.join("output", date_str)
-
-        # If the directory already exists, delete it, as it'll be from the exact same timestamp so it's safe to do so
-        if os.path.exists(output_dir):
-            shutil.rmtree(output_dir)
-        os.makedirs(os.path.join(output_dir, "overdue"))
-
-        # Create log files
+        if resume_dir:
+            output_dir = resume_dir
+        else:
+            # Get current date, hour, and minute
+            current_datetime = datetime.datetime.now()
+            date_str = current_datetime.strftime("%Y-%m-%d_%H-%M")
+
+            # Create output directory with date and time stamp. If a run already started this minute, keep it and number this one
+            output_dir = os.path.join("output", date_str)
+            run_number = 2
+            while os.path.exists(output_dir):
+                output_dir = os.path.join("output", f"{date_str}_{run_number}")
+                run_number += 1
+
+        os.makedirs(os.path.join(output_dir, "overdue"), exist_ok=True)
+
+        # Create log files, or add to them if resuming
         dashboard_log = open(os.path.join(output_dir, "bot.log"), "a+")
         output_log = open(os.path.join(output_dir, "output.txt"), "a+")
 
@@ -44,30 +49,22 @@ def log(type, content):
     # Log to console and file
     global dashboard_log, output_log
 
-    if dashboard_log:
-        dashboard_log.write(f"{type} - {datetime.datetime.now()}: {content}\n")
-        dashboard_log.flush()
+    with write_lock:
+        if dashboard_log:
+            dashboard_log.write(f"{type} - {datetime.datetime.now()}: {content}\n")
+            dashboard_log.flush()
 
-    print(f"{type} - {content}")
+        print(f"{type} - {content}")
 
 
 # Outputs a message against a tutors name
 def output(name, text):
     global output_log
 
-    print(f"{name} - {text}")
-    output_log.write(f"{name} - {text}\n")
-    output_log.flush()
-
-
-# Takes a screenshot of the active page, naming after the name of the tutor, and assignment number
-def screenshot(driver, name, number):
-
-    if driver:
-        location = output_dir + "/overdue/"
-        driver.driver.save_screenshot(location + name + str(number) + ".png")
-    else:
-        log("Error", "Could not take screenshot, driver not initialized")
+    with write_lock:
+        print(f"{name} - {text}")
+        output_log.write(f"{name} - {text}\n")
+        output_log.flush()
 
 
 def load_json(filename):
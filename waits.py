@@ -0,0 +1,57 @@
+# Description: Explicit waits for page events, used instead of fixed sleeps. Records how long every wait took in the run profile
+
+import time
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Custom modules
+import metrics
+import timing
+
+
+POLL_FREQUENCY = 0.1 # How often to re-check a condition, in seconds
+DOM_QUIET_TIME = 300 # How long the page must go without changing to be considered settled, in milliseconds
+
+# Waits until condition returns something truthy, and returns it. Raises TimeoutException after timeout seconds
+def wait_until(driver, timeout, condition, label):
+    start = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY, ignored_exceptions=[StaleElementReferenceException]).until(condition)
+    except TimeoutException:
+        metrics.inc("timeouts", phase="wait: " + label)
+        raise
+    finally:
+        timing.record("wait: " + label, time.perf_counter() - start)
+
+
+# Same as wait_until, but returns False instead of raising on timeout
+def wait_until_or_timeout(driver, timeout, condition, label):
+    try:
+        return wait_until(driver, timeout, condition, label)
+    except TimeoutException:
+        return False
+
+
+# Condition: the DOM has not changed for DOM_QUIET_TIME. A MutationObserver is added to the page the first time this is checked
+def dom_settled(driver):
+    quiet_time = driver.execute_script("""
+        if (!window.__checkerObserver) {
+            window.__checkerLastMutation = Date.now();
+            window.__checkerObserver = new MutationObserver(function() { window.__checkerLastMutation = Date.now(); });
+            window.__checkerObserver.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+        }
+        return Date.now() - window.__checkerLastMutation;
+    """)
+    return quiet_time >= DOM_QUIET_TIME
+
+
+# Condition: the page has finished loading and has no AJAX requests in progress. Canvas makes its requests through jQuery
+def network_idle(driver):
+    return driver.execute_script("return document.readyState === 'complete' && (!window.jQuery || window.jQuery.active === 0);")
+
+
+# Condition: the page has finished loading, and has stopped changing
+def page_settled(driver):
+    return network_idle(driver) and dom_settled(driver)
+
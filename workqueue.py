@@ -0,0 +1,246 @@
+# Description: A durable queue of tutors to check, kept in a SQLite database, so a sweep can be shared between worker processes on one or
+# more machines. A coordinator adds the tutors and collects their results. Workers lease a tutor at a time, and a tutor whose worker dies
+# goes back on the queue when its lease expires. For workers on other machines, the database must be on a shared drive with working file locks
+
+import json
+import socket
+import sqlite3
+import threading
+import time
+
+# Custom modules
+from utils import *
+
+
+QUEUE_FILE = "work_queue.db"
+LEASE_SECONDS = 300 # How long a worker has a tutor for before it is given to another worker. Renewed while the tutor is being checked
+MAX_ATTEMPTS = 3 # How many times a tutor is tried before it is given up on
+POLL_INTERVAL = 2 # Seconds between checks for new work or finished results
+
+
+class WorkQueue:
+
+    # Opens (or creates) the queue database
+    def __init__(self, filename=QUEUE_FILE):
+        # Transactions are started explicitly, so leasing an item is atomic between processes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sweeps (
+                sweep_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                closed INTEGER NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS items (
+                item_id INTEGER PRIMARY KEY,
+                sweep_id TEXT NOT NULL REFERENCES sweeps (sweep_id),
+                priority INTEGER NOT NULL,
+                tutor_id TEXT NOT NULL,
+                tutor_name TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                tutor_data TEXT,
+                records TEXT,
+                collected INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (sweep_id, tutor_id)
+            );
+            CREATE INDEX IF NOT EXISTS items_status ON items (sweep_id, status, priority);
+        """)
+
+
+    # Runs function(connection) in a write transaction, which locks the database against other processes until it is done
+    def transaction(self, function):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                value = function(self.connection)
+                self.connection.execute("COMMIT")
+                return value
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+
+    # Adds a sweep, and its tutors in the order they should be checked. Tutors already in the sweep (eg when resuming) were not finished by
+    # the coordinator, so they are given their attempts back, failed ones are tried again, and finished ones are collected again in case the
+    # coordinator stopped before saving them. A tutor still leased to a worker keeps its lease
+    def add_sweep(self, sweep_id, tutors):
+        def add(connection):
+            connection.execute("INSERT OR IGNORE INTO sweeps (sweep_id, created_at) VALUES (?, ?)", (sweep_id, time.time()))
+            connection.execute("UPDATE sweeps SET closed = 0 WHERE sweep_id = ?", (sweep_id,))
+            items = [(sweep_id, str(tutor.id)) for tutor in tutors]
+            connection.executemany("UPDATE items SET status = CASE WHEN status = 'failed' THEN 'pending' ELSE status END, attempts = 0 "
+                                   "WHERE sweep_id = ? AND tutor_id = ? AND status != 'done'", items)
+            connection.executemany("UPDATE items SET collected = 0 WHERE sweep_id = ? AND tutor_id = ? AND status = 'done'", items)
+            connection.executemany("INSERT OR IGNORE INTO items (sweep_id, priority, tutor_id, tutor_name) VALUES (?, ?, ?, ?)",
+                                   [(sweep_id, priority, str(tutor.id), tutor.name) for priority, tutor in enumerate(tutors)])
+        self.transaction(add)
+
+
+    # Marks a sweep as finished, so workers stop waiting for its items
+    def close_sweep(self, sweep_id):
+        self.transaction(lambda connection: connection.execute("UPDATE sweeps SET closed = 1 WHERE sweep_id = ?", (sweep_id,)))
+
+
+    # Leases the next tutor of the oldest open sweep to a worker. Items whose lease has expired are leased again, unless they have been tried
+    # MAX_ATTEMPTS times, when they are marked as failed. Returns (item ID, tutor ID, tutor name), or None if there is nothing to lease
+    def lease(self, owner):
+        def lease_next(connection):
+            now = time.time()
+            connection.execute("UPDATE items SET status = 'failed' WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, MAX_ATTEMPTS))
+
+            row = connection.execute(
+                "SELECT items.item_id, items.tutor_id, items.tutor_name FROM items JOIN sweeps ON sweeps.sweep_id = items.sweep_id "
+                "WHERE sweeps.closed = 0 AND (items.status = 'pending' OR (items.status = 'leased' AND items.lease_expires < ?)) "
+                "ORDER BY sweeps.created_at, items.priority LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row:
+                connection.execute("UPDATE items SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE item_id = ?",
+                                   (owner, now + LEASE_SECONDS, row[0]))
+            return row
+        return self.transaction(lease_next)
+
+
+    # Extends a worker's lease on an item. Returns False if the worker no longer holds it
+    def renew(self, item_id, owner):
+        return self.transaction(lambda connection: connection.execute(
+            "UPDATE items SET lease_expires = ? WHERE item_id = ? AND lease_owner = ? AND status = 'leased'", (time.time() + LEASE_SECONDS, item_id, owner)
+        ).rowcount > 0)
+
+
+    # Stores the result of a leased item. Ignored if the lease was lost to another worker
+    def complete(self, item_id, owner, result, tutor_data, records):
+        return self.transaction(lambda connection: connection.execute(
+            "UPDATE items SET status = 'done', result = ?, tutor_data = ?, records = ? WHERE item_id = ? AND lease_owner = ? AND status = 'leased'",
+            (result, json.dumps(tutor_data), json.dumps(records), item_id, owner)
+        ).rowcount > 0)
+
+
+    # Gives up a leased item after an error, so it can be tried again straight away, or marks it as failed if it is out of attempts
+    def release(self, item_id, owner):
+        self.transaction(lambda connection: connection.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, lease_owner = NULL, lease_expires = NULL "
+            "WHERE item_id = ? AND lease_owner = ? AND status = 'leased'",
+            (MAX_ATTEMPTS, item_id, owner)
+        ))
+
+
+    # Returns the finished items of a sweep that have not been collected yet, as (tutor ID, result, tutor data, records), and marks them collected
+    def collect(self, sweep_id):
+        def take(connection):
+            rows = connection.execute("SELECT item_id, tutor_id, result, tutor_data, records FROM items WHERE sweep_id = ? AND status = 'done' AND collected = 0",
+                                      (sweep_id,)).fetchall()
+            connection.executemany("UPDATE items SET collected = 1 WHERE item_id = ?", [(row[0],) for row in rows])
+            return [(tutor_id, result, json.loads(tutor_data), json.loads(records)) for item_id, tutor_id, result, tutor_data, records in rows]
+        return self.transaction(take)
+
+
+    # Returns how many items of a sweep have each status
+    def counts(self, sweep_id):
+        # Expired leases that are out of attempts count as failed, even before a worker next looks for work
+        self.transaction(lambda connection: connection.execute(
+            "UPDATE items SET status = 'failed' WHERE sweep_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?", (sweep_id, time.time(), MAX_ATTEMPTS)
+        ))
+        with self.lock:
+            return dict(self.connection.execute("SELECT status, COUNT(*) FROM items WHERE sweep_id = ? GROUP BY status", (sweep_id,)).fetchall())
+
+
+    # Returns True if any sweep is still open
+    def has_open_sweeps(self):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM sweeps WHERE closed = 0 LIMIT 1").fetchone() is not None
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Renews a lease every third of LEASE_SECONDS until stopped is set, so a slow tutor is not given to another worker
+def keep_lease(work_queue, item_id, owner, stopped):
+    while not stopped.wait(LEASE_SECONDS / 3):
+        if not work_queue.renew(item_id, owner):
+            return
+
+
+# Takes tutors from the queue and checks them until no open sweep has anything left to lease.
+# make_tutor(tutor ID, name) should return a new Tutor, and take_records(tutor) its submission records
+def run_worker(work_queue, create_checker, check_tutor, make_tutor, take_records):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    log("Worker", f"Starting worker {owner}")
+
+    Driver = None
+    checked = 0
+    try:
+        while True:
+            item = work_queue.lease(owner)
+            if item is None:
+                if not work_queue.has_open_sweeps():
+                    break
+                # Every remaining tutor is leased to another worker, but may come back if that worker dies
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            # The browser is only started once there is work for it
+            if Driver is None:
+                Driver = create_checker()
+
+            item_id, tutor_id, tutor_name = item
+            tutors = [make_tutor(tutor_name, tutor_id)]
+
+            stopped = threading.Event()
+            threading.Thread(target=keep_lease, args=(work_queue, item_id, owner, stopped), daemon=True).start()
+            try:
+                result = check_tutor(Driver, tutors, 0)
+            except Exception as e:
+                log(tutor_name, f"Error checking tutor, returning it to the queue: {e}")
+                take_records(tutors[0])
+                work_queue.release(item_id, owner)
+                Driver.stop_acting_as_user()
+                continue
+            finally:
+                stopped.set()
+
+            if not work_queue.complete(item_id, owner, result, tutors[0].to_dict(), take_records(tutors[0])):
+                log(tutor_name, "Lease expired before the tutor was finished, its result was discarded")
+            checked += 1
+    finally:
+        if Driver is not None:
+            Driver.quit()
+
+    log("Worker", f"No work left, {owner} checked {checked} tutors")
+
+
+# Adds the tutors at the given positions to the queue as a sweep, then waits for workers to check them. on_result(position, output text, tutor data, records)
+# is called as each tutor's result comes in. Returns once every tutor is done or has failed
+def run_coordinator(work_queue, sweep_id, tutors, positions, on_result):
+    work_queue.add_sweep(sweep_id, [tutors[current_tutor] for current_tutor in positions])
+    position_of = {str(tutors[current_tutor].id): current_tutor for current_tutor in positions}
+    log("Coordinator", f"Queued {len(positions)} tutors as sweep {sweep_id}. Start workers with: python dashboardchecker.py --worker")
+
+    try:
+        while True:
+            for tutor_id, result, tutor_data, records in work_queue.collect(sweep_id):
+                if tutor_id in position_of:
+                    on_result(position_of[tutor_id], result, tutor_data, records)
+
+            counts = work_queue.counts(sweep_id)
+            if not counts.get("pending") and not counts.get("leased"):
+                break
+            time.sleep(POLL_INTERVAL)
+
+        # Collect anything finished since the last look
+        for tutor_id, result, tutor_data, records in work_queue.collect(sweep_id):
+            if tutor_id in position_of:
+                on_result(position_of[tutor_id], result, tutor_data, records)
+    finally:
+        work_queue.close_sweep(sweep_id)
+
+    if counts.get("failed"):
+        log("Error", f"{counts['failed']} tutors could not be checked after {MAX_ATTEMPTS} attempts")